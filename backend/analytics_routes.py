@@ -0,0 +1,106 @@
+# Analytics routes - aggregate expenses in SQL for the dashboard
+from flask import jsonify, request
+from models import db, Expense, MonthlyRollup
+from expense_filters import parse_expense_filters
+from database import week_start
+from sqlalchemy import func
+
+# Timeseries buckets, keyed by the `period` query param
+PERIODS = ('day', 'week', 'month')
+
+def period_expression(period):
+    """SQL expression bucketing expenses by spend date into day, week (its Monday) or month."""
+    if period == 'month':
+        return Expense.month
+    if period == 'week':
+        return week_start(Expense.spend_date)
+    return Expense.spend_date
+
+def category_group(category_key):
+    """Group categories case-insensitively, like budgets and the category filter; blank counts as Other."""
+    return func.coalesce(func.nullif(category_key, ''), 'other')
+
+def category_label(category):
+    """Spelling shown for a category group: the lowest in sort order (e.g. 'Food' over 'food')."""
+    return func.coalesce(func.nullif(func.min(category), ''), 'Other')
+
+def register_analytics_routes(app, token_required):
+    """Register analytics routes"""
+
+    def user_filters(current_user):
+        return [Expense.user_id == current_user.id, *parse_expense_filters(request.args)]
+
+    @app.route('/analytics/summary', methods=['GET'])
+    @token_required
+    def analytics_summary(current_user):
+        """Totals, per-category and top-vendor sums for the current user (accepts /list filters; vendors=0 skips vendors)"""
+        try:
+            filters = user_filters(current_user)
+        except ValueError:
+            return jsonify({"error": "Invalid filter"}), 400
+
+        total = func.sum(Expense.amount)
+        count = func.count(Expense.id)
+        if len(filters) == 1:
+            # Unfiltered: one row per month and category from the rollups instead of every expense
+            rollup_total = func.sum(MonthlyRollup.total)
+            by_category = db.session.query(category_label(MonthlyRollup.label), rollup_total,
+                                           func.sum(MonthlyRollup.count)) \
+                .filter(MonthlyRollup.user_id == current_user.id) \
+                .group_by(category_group(MonthlyRollup.category)).order_by(rollup_total.desc()).all()
+        else:
+            by_category = db.session.query(category_label(Expense.category), total, count).filter(*filters) \
+                .group_by(category_group(Expense.category_key)).order_by(total.desc()).all()
+        top_vendors = []
+        vendor_limit = request.args.get('vendors', 5, type=int)
+        if vendor_limit > 0:
+            top_vendors = db.session.query(Expense.vendor, total, count) \
+                .filter(*filters, Expense.vendor != '').group_by(Expense.vendor) \
+                .order_by(total.desc()).limit(vendor_limit).all()
+
+        overall = sum(row[1] or 0.0 for row in by_category)
+        expense_count = sum(row[2] for row in by_category)
+        return jsonify({
+            "total": overall,
+            "count": expense_count,
+            "average": round(overall / expense_count, 2) if expense_count else 0,
+            "top_category": by_category[0][0] if by_category else None,
+            "by_category": [{"category": c, "total": t or 0.0, "count": n} for c, t, n in by_category],
+            "top_vendors": [{"vendor": v, "total": t or 0.0, "count": n} for v, t, n in top_vendors],
+        })
+
+    @app.route('/analytics/timeseries', methods=['GET'])
+    @token_required
+    def analytics_timeseries(current_user):
+        """Spend per day/week/month as parallel arrays; group_by=category adds one series per category"""
+        period = request.args.get('period', 'day')
+        if period not in PERIODS:
+            return jsonify({"error": f"period must be one of {', '.join(PERIODS)}"}), 400
+        try:
+            filters = user_filters(current_user)
+        except ValueError:
+            return jsonify({"error": "Invalid filter"}), 400
+
+        bucket = period_expression(period)
+        if period != 'month':
+            filters.append(Expense.spend_date.isnot(None))
+        rows = db.session.query(bucket, func.sum(Expense.amount), func.count(Expense.id)) \
+            .filter(*filters).group_by(bucket).order_by(bucket).all()
+        result = {
+            "period": period,
+            "labels": [str(row[0]) for row in rows],
+            "totals": [row[1] or 0.0 for row in rows],
+            "counts": [row[2] for row in rows],
+        }
+
+        if request.args.get('group_by') == 'category':
+            index = {row[0]: i for i, row in enumerate(rows)}
+            series = {}
+            for label, cat, total in db.session.query(bucket, category_label(Expense.category),
+                                                      func.sum(Expense.amount)) \
+                    .filter(*filters).group_by(bucket, category_group(Expense.category_key)):
+                if label in index:
+                    series.setdefault(cat, [0.0] * len(index))[index[label]] = total or 0.0
+            result["series"] = [{"category": cat, "totals": totals} for cat, totals in sorted(series.items())]
+
+        return jsonify(result)
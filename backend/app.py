@@ -1,42 +1,41 @@
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, current_app, jsonify, request
 from flask_cors import CORS
-from werkzeug.utils import secure_filename
+import base64
+import json
 import os
-import joblib
-from ocr import extract_text_from_image, extract_text_and_fields
-from models import db, User, Expense, Budget
+from models import db, User, Expense, Budget, ensure_columns, ensure_indexes
+from database import configure_database, dispose_engine_after_fork
+from auth_cache import get_user, auth_cache_stats
+from passwords import VerifierBusy
+from expense_filters import parse_expense_filters
+from categorizer import load_model, categorization_text, categorize, categorize_many, cache_stats
 from budget_routes import register_budget_routes
+from analytics_routes import register_analytics_routes
+from import_routes import register_import_routes
+from export_routes import register_export_routes
+from model_routes import admin_required, register_model_routes, register_model_commands
+from learning import record_correction, schedule_learning
+from rollups import apply_expense, ensure_rollups, register_rollup_commands
+from migrations import run_migrations, register_migration_commands
+from upload_routes import register_upload_routes
+from ocr_jobs import init_ocr_jobs
 import jwt
 from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
 from functools import wraps
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)  # Enable Cross-Origin Resource Sharing
-app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'  # Change this!
+# Largest page /list will return
+LIST_MAX_LIMIT = 500
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///expense_tracker.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Maximum number of items accepted by one /categorize/batch request
+CATEGORIZE_BATCH_MAX = 10000
 
-# Initialize database
-db.init_app(app)
-
-# Create tables
-with app.app_context():
-    db.create_all()
-
-# Load the trained ML model and vectorizer
-model = joblib.load('expense_categorizer_model.pkl')
-vectorizer = joblib.load('vectorizer.pkl')
-
-# Configure upload folder
-UPLOAD_FOLDER = 'uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Core API routes (auth, categorization, expenses); registered by create_app
+core = Blueprint('core', __name__)
 
 # Basic route
-@app.route('/')
+@core.route('/')
 def home():
     return jsonify({"message": "Welcome to the Smart Expense Tracker API!"})
 
@@ -51,9 +50,15 @@ def token_required(f):
         try:
             if token.startswith('Bearer '):
                 token = token[7:]
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user_email = data['email']
-            current_user = User.query.filter_by(email=current_user_email).first()
+            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+            if 'uid' in data:
+                # Served from the in-process user cache; snapshot is read-only
+                current_user = get_user(data['uid'])
+                if current_user and current_user.email != data['email']:
+                    current_user = None
+            else:
+                # Tokens issued before the uid claim was added
+                current_user = User.query.filter_by(email=data['email']).first()
             if not current_user:
                 return jsonify({'message': 'User not found!'}), 401
         except:
@@ -61,10 +66,7 @@ def token_required(f):
         return f(current_user, *args, **kwargs)
     return decorated
 
-# Register budget routes
-register_budget_routes(app, token_required)
-
-@app.route('/register', methods=['POST'])
+@core.route('/register', methods=['POST'])
 def register():
     data = request.json
     if not data or 'email' not in data or 'password' not in data:
@@ -86,7 +88,7 @@ def register():
     
     return jsonify({"message": "User created successfully", "user": user.to_dict()}), 201
 
-@app.route('/login', methods=['POST'])
+@core.route('/login', methods=['POST'])
 def login():
     data = request.json
     if not data or 'email' not in data or 'password' not in data:
@@ -96,63 +98,54 @@ def login():
     password = data['password']
     
     user = User.query.filter_by(email=email).first()
-    if not user or not user.check_password(password):
-        return jsonify({"error": "Invalid credentials"}), 401
+    try:
+        if not user or not user.check_password(password):
+            return jsonify({"error": "Invalid credentials"}), 401
+    except VerifierBusy:
+        return jsonify({"error": "Too many logins in progress, try again shortly"}), 503, {'Retry-After': '1'}
+    
+    # Upgrade hashes made with older hashing parameters while we have the plain password
+    if user.password_needs_rehash():
+        user.set_password(password)
+        db.session.commit()
     
     token = jwt.encode({
+        'uid': user.id,
         'email': user.email,
         'exp': datetime.utcnow() + timedelta(hours=24)
-    }, app.config['SECRET_KEY'], algorithm="HS256")
+    }, current_app.config['SECRET_KEY'], algorithm="HS256")
     
     return jsonify({
         "token": token,
         "user": user.to_dict()
     })
 
-@app.route('/profile', methods=['GET'])
+@core.route('/profile', methods=['GET'])
 @token_required
 def get_profile(current_user):
     return jsonify({"user": current_user.to_dict()})
 
-@app.route('/profile', methods=['PUT'])
+@core.route('/profile', methods=['PUT'])
 @token_required
 def update_profile(current_user):
     data = request.json or {}
     name = data.get('name')
     # We keep email immutable for simplicity; extend as needed
+    # current_user may be a cached snapshot, so update the row itself (which evicts the cache entry)
+    user = db.session.get(User, current_user.id)
     if name:
-        current_user.name = name
+        user.name = name
         db.session.commit()
-    return jsonify({"message": "Profile updated", "user": current_user.to_dict()})
-
-@app.route('/upload', methods=['POST'])
-def upload_receipt():
-    if 'file' not in request.files:
-        return jsonify({"error": "No file part"}), 400
-
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({"error": "No selected file"}), 400
+    return jsonify({"message": "Profile updated", "user": user.to_dict()})
 
-    filename = secure_filename(file.filename)
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
-
-    # Extract text + parsed fields using OCR
-    try:
-        ocr_data = extract_text_and_fields(filepath)
-    except Exception:
-        # fallback to plain text in case of any unexpected error
-        extracted_text = extract_text_from_image(filepath)
-        ocr_data = {"text": extracted_text, "fields": {}}
-    return jsonify({
-        "extracted_text": ocr_data.get("text"),
-        "text": ocr_data.get("text"),
-        "fields": ocr_data.get("fields", {}),
-        "lines": ocr_data.get("lines", []),
-    })
+@core.route('/auth/stats', methods=['GET'])
+@token_required
+@admin_required
+def auth_stats(current_user):
+    """Hit rate and size of the authenticated-user cache"""
+    return jsonify(auth_cache_stats())
 
-@app.route('/categorize', methods=['POST'])
+@core.route('/categorize', methods=['POST'])
 def categorize_expense():
     data = request.json
     if not data:
@@ -163,49 +156,63 @@ def categorize_expense():
     if not text:
         return jsonify({"error": "No text provided"}), 400
     
-    # Check if receipt_type is provided from OCR
-    receipt_type = data.get('receipt_type', '').lower()
-    vendor = data.get('vendor', '')
-    
-    # Smart categorization: Use receipt_type to create better description
-    categorization_text = text
-    if receipt_type:
-        # Map receipt types to category hints
-        receipt_to_category_hints = {
-            'grocery': 'Supermarket groceries food shopping',
-            'restaurant': 'Restaurant dining food meal',
-            'fuel': 'Petrol fuel gas station transport',
-            'utilities': 'Electricity water gas utility bill payment',
-            'pharmacy': 'Pharmacy medicine medical healthcare',
-            'transportation': 'Taxi uber ride transport fare',
-            'online': 'Online purchase shopping order',
-        }
-        
-        # Use the hint if available, otherwise combine vendor + receipt_type
-        if receipt_type in receipt_to_category_hints:
-            categorization_text = receipt_to_category_hints[receipt_type]
-        elif vendor:
-            categorization_text = f"{vendor} {receipt_type}"
-    
-    # Limit text length to avoid confusion (use first 100 chars or smart text)
-    if len(categorization_text) > 200:
-        # If it's very long (full receipt text), try to extract vendor/key info
-        lines = categorization_text.split('\n')
-        # Use first few meaningful lines
-        categorization_text = ' '.join(lines[:3])[:100]
-
-    vectorized_desc = vectorizer.transform([categorization_text])
-    category = model.predict(vectorized_desc)[0]
-    proba = model.predict_proba(vectorized_desc)[0]
-    confidence = max(proba)
+    # Smart categorization: use OCR receipt_type/vendor hints to build a better description
+    text_to_score = categorization_text(text, data.get('receipt_type', ''), data.get('vendor', ''))
+    result = categorize(text_to_score)
 
     return jsonify({
-        "category": category, 
-        "confidence": float(confidence),
-        "categorization_text": categorization_text  # For debugging
+        "category": result["category"], 
+        "confidence": result["confidence"],
+        "model_version": result["model_version"],
+        "categorization_text": text_to_score  # For debugging
     })
 
-@app.route('/add', methods=['POST'])
+@core.route('/categorize/batch', methods=['POST'])
+def categorize_expenses_batch():
+    """Categorize a list of {text, receipt_type, vendor} items in one vectorized pass"""
+    data = request.json
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return jsonify({"error": "Expected a list of items"}), 400
+    if len(items) > CATEGORIZE_BATCH_MAX:
+        return jsonify({"error": f"At most {CATEGORIZE_BATCH_MAX} items per batch"}), 400
+    try:
+        top_k = int(data.get('top_k', 3)) if isinstance(data, dict) else 3
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_k must be an integer"}), 400
+    if top_k < 1:
+        return jsonify({"error": "top_k must be at least 1"}), 400
+
+    texts = []
+    valid = []  # positions of items that have text to score
+    results = [{"error": "No text provided"} for _ in items]
+    for i, item in enumerate(items):
+        if isinstance(item, str):
+            item = {'text': item}
+        if not isinstance(item, dict):
+            continue
+        text = item.get('description') or item.get('text') or ''
+        receipt_type = item.get('receipt_type') or ''
+        vendor = item.get('vendor') or ''
+        if not all(isinstance(value, str) for value in (text, receipt_type, vendor)):
+            results[i] = {"error": "text, description, receipt_type and vendor must be strings"}
+        elif text:
+            texts.append(categorization_text(text, receipt_type, vendor))
+            valid.append(i)
+
+    for i, text_to_score, result in zip(valid, texts, categorize_many(texts, top_k=top_k)):
+        result["categorization_text"] = text_to_score
+        results[i] = result
+    return jsonify(results)
+
+@core.route('/categorize/stats', methods=['GET'])
+@token_required
+@admin_required
+def categorize_stats(current_user):
+    """Categorization cache hit/miss/eviction counters"""
+    return jsonify(cache_stats())
+
+@core.route('/add', methods=['POST'])
 @token_required
 def add_expense(current_user):
     data = request.json
@@ -222,30 +229,81 @@ def add_expense(current_user):
     )
     
     db.session.add(expense)
+    apply_expense(expense)
     db.session.commit()
     
     return jsonify({"message": "Expense added", "expense": expense.to_dict()}), 201
 
-@app.route('/list', methods=['GET'])
+def encode_cursor(expense):
+    payload = json.dumps([expense.created_at.isoformat(), expense.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor):
+    created_at, expense_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(created_at), int(expense_id)
+
+@core.route('/list', methods=['GET'])
 @token_required
 def list_expenses(current_user):
+    """List the user's expenses, newest first.
+
+    Optional query params: limit and cursor for keyset pagination (the next
+    cursor comes back in the X-Next-Cursor header), the filters from
+    parse_expense_filters, and fields=id,amount,... to project the output.
+    Without limit the full history is returned, as before.
+    """
+    try:
+        conditions = parse_expense_filters(request.args)
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        if cursor:
+            created_at, expense_id = decode_cursor(cursor)
+            # Keyset condition on (created_at, id), served by ix_expenses_user_created_id
+            conditions.append(or_(
+                Expense.created_at < created_at,
+                and_(Expense.created_at == created_at, Expense.id < expense_id)
+            ))
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid filter or cursor"}), 400
+
+    fields = None
+    if request.args.get('fields'):
+        fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+        unknown = set(fields) - set(Expense.DICT_FIELDS)
+        if unknown:
+            return jsonify({"error": f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
+
     # Query expenses for the current user only
-    expenses = Expense.query.filter_by(user_id=current_user.id).order_by(Expense.created_at.desc()).all()
-    return jsonify([e.to_dict() for e in expenses])
+    query = Expense.query.filter(Expense.user_id == current_user.id, *conditions) \
+        .order_by(Expense.created_at.desc(), Expense.id.desc())
+    if fields:
+        loaded = set(fields) | {'id', 'created_at'}
+        query = query.options(load_only(*[getattr(Expense, f) for f in loaded]))
+    if limit is not None:
+        limit = max(1, min(limit, LIST_MAX_LIMIT))
+        query = query.limit(limit + 1)
 
-@app.route('/delete/<int:expense_id>', methods=['DELETE'])
+    expenses = query.all()
+    headers = {}
+    if limit is not None and len(expenses) > limit:
+        expenses = expenses[:limit]
+        headers['X-Next-Cursor'] = encode_cursor(expenses[-1])
+    return jsonify([e.to_dict(fields) for e in expenses]), 200, headers
+
+@core.route('/delete/<int:expense_id>', methods=['DELETE'])
 @token_required
 def delete_expense(current_user, expense_id):
     expense = Expense.query.filter_by(id=expense_id, user_id=current_user.id).first()
     if not expense:
         return jsonify({"error": "Expense not found"}), 404
     
+    apply_expense(expense, sign=-1)
     db.session.delete(expense)
     db.session.commit()
     
     return jsonify({"message": "Expense deleted"})
 
-@app.route('/update/<int:expense_id>', methods=['PUT'])
+@core.route('/update/<int:expense_id>', methods=['PUT'])
 @token_required
 def update_expense(current_user, expense_id):
     expense = Expense.query.filter_by(id=expense_id, user_id=current_user.id).first()
@@ -253,6 +311,9 @@ def update_expense(current_user, expense_id):
         return jsonify({"error": "Expense not found"}), 404
     
     data = request.json
+    old_category = expense.category
+    # Move the expense out of its old rollup and into the new one in the same transaction
+    apply_expense(expense, sign=-1)
     if data.get('vendor'): 
         expense.vendor = data['vendor']
     if data.get('date'): 
@@ -263,10 +324,85 @@ def update_expense(current_user, expense_id):
         expense.amount = float(data['amount'])
     if data.get('category'): 
         expense.category = data['category']
+    apply_expense(expense)
+    # A changed category is a correction the categorizer learns from
+    correction = record_correction(expense, old_category)
     
     db.session.commit()
+    if correction:
+        schedule_learning(current_app._get_current_object())
     
     return jsonify({"message": "Expense updated", "expense": expense.to_dict()})
 
+def create_app(config=None):
+    """Build the Flask app.
+
+    The categorization model is loaded on first use (or here, with
+    PRELOAD_MODELS=1) and EasyOCR only inside the OCR worker processes, so
+    creating an app stays cheap for workers that never touch them.
+    """
+    app = Flask(__name__)
+    CORS(app, expose_headers=['X-Next-Cursor'])  # Enable Cross-Origin Resource Sharing
+    app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'  # Change this!
+    
+    # Database configuration (DATABASE_URL, see database.py)
+    configure_database(app)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    
+    # Configure upload folder
+    app.config['UPLOAD_FOLDER'] = 'uploads'
+    
+    # Load EasyOCR models in the OCR workers at startup instead of on the first upload
+    app.config['OCR_PRELOAD'] = os.environ.get('OCR_PRELOAD', '0') == '1'
+    # Load the ML model and vectorizer at startup instead of on the first categorization
+    app.config['PRELOAD_MODELS'] = os.environ.get('PRELOAD_MODELS', '0') == '1'
+    app.config['MIGRATE_ON_STARTUP'] = os.environ.get('MIGRATE_ON_STARTUP', '1') == '1'
+    
+    if config:
+        app.config.update(config)
+    
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    
+    # Initialize database
+    db.init_app(app)
+    
+    # Create tables
+    with app.app_context():
+        db.create_all()
+        ensure_columns()
+        ensure_indexes()
+        if app.config['MIGRATE_ON_STARTUP']:
+            list(run_migrations())
+        ensure_rollups()
+        dispose_engine_after_fork(db.engine)
+    
+    if app.config['PRELOAD_MODELS']:
+        load_model()
+    
+    app.register_blueprint(core)
+    register_budget_routes(app, token_required)
+    register_analytics_routes(app, token_required)
+    register_import_routes(app, token_required)
+    register_export_routes(app, token_required)
+    register_model_routes(app, token_required)
+    register_rollup_commands(app)
+    register_migration_commands(app)
+    register_model_commands(app)
+    
+    # Register receipt upload routes and resume any queued OCR jobs
+    register_upload_routes(app)
+    init_ocr_jobs(app)
+    return app
+
+
+def __getattr__(name):
+    # `app:app` (gunicorn, flask run, older scripts) keeps working: the app is built on first access
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
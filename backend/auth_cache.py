@@ -0,0 +1,106 @@
+"""
+In-process cache of authenticated users for token_required.
+
+Tokens carry the user id, so a cache hit skips the users query entirely.
+Entries are read-only snapshots that expire after AUTH_CACHE_TTL seconds and
+are dropped as soon as the User row is updated or deleted in this process
+(other processes see the change within the TTL).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+from models import db, User
+
+AUTH_CACHE_TTL = float(os.environ.get('AUTH_CACHE_TTL', '60'))
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', '10000'))
+
+_cache = OrderedDict()  # user id -> (expires_at, CachedUser), least recently used first
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0}
+
+
+class CachedUser:
+    """Detached, read-only snapshot of a User with the attributes routes use."""
+    __slots__ = ('id', 'name', 'email', 'created_at')
+
+    def __init__(self, user):
+        self.id = user.id
+        self.name = user.name
+        self.email = user.email
+        self.created_at = user.created_at
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'email': self.email,
+            'created_at': self.created_at.isoformat()
+        }
+
+
+def get_user(user_id):
+    """CachedUser for `user_id`, loading it on a miss; None if the user does not exist."""
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is not None:
+            if entry[0] > now:
+                _cache.move_to_end(user_id)
+                _stats['hits'] += 1
+                return entry[1]
+            del _cache[user_id]
+            _stats['expired'] += 1
+        _stats['misses'] += 1
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    cached = CachedUser(user)
+    with _lock:
+        _cache[user_id] = (now + AUTH_CACHE_TTL, cached)
+        _cache.move_to_end(user_id)
+        while len(_cache) > AUTH_CACHE_SIZE:
+            _cache.popitem(last=False)
+            _stats['evictions'] += 1
+    return cached
+
+
+def invalidate(user_id):
+    with _lock:
+        if _cache.pop(user_id, None) is not None:
+            _stats['invalidations'] += 1
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+
+def auth_cache_stats():
+    with _lock:
+        lookups = _stats['hits'] + _stats['misses']
+        return {
+            **_stats,
+            'hit_rate': round(_stats['hits'] / lookups, 4) if lookups else 0.0,
+            'entries': len(_cache),
+            'max_entries': AUTH_CACHE_SIZE,
+            'ttl': AUTH_CACHE_TTL,
+        }
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, user):
+    invalidate(user.id)
+    # Drop it again on commit, in case a concurrent request re-cached the old row meanwhile
+    db.session.info.setdefault('auth_cache_invalidate', set()).add(user.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed(session):
+    for user_id in session.info.pop('auth_cache_invalidate', ()):
+        invalidate(user_id)
@@ -0,0 +1,90 @@
+"""
+Benchmark receipt preprocessing: OCR time saved vs. accuracy of the total field.
+
+Usage:
+    python benchmark_ocr.py uploads/ [--labels totals.json] [--edges 1024 1600 2048] [--crop] [--deskew]
+
+`totals.json` maps file names to the expected grand total. Without labels each
+configuration is scored by agreement with the unprocessed, full-resolution run.
+"""
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+
+from ocr import extract_text_and_fields, preprocess_config, warm_up_readers
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp'}
+
+
+def run_config(name, files, config):
+    totals = {}
+    stage_time = defaultdict(float)
+    start = time.perf_counter()
+    for path in files:
+        result = extract_text_and_fields(path, preprocess=config)
+        totals[os.path.basename(path)] = (result["fields"].get("total") or {}).get("amount")
+        for stage, seconds in result.get("timings", {}).items():
+            stage_time[stage] += seconds
+    elapsed = time.perf_counter() - start
+    return {"name": name, "elapsed": elapsed, "totals": totals, "stages": dict(stage_time)}
+
+
+def accuracy(totals, expected):
+    scored = [name for name in totals if expected.get(name) is not None]
+    if not scored:
+        return None
+    correct = sum(1 for name in scored if totals[name] is not None and abs(totals[name] - float(expected[name])) < 0.01)
+    return correct / len(scored)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('folder', help='Folder of sample receipt images')
+    parser.add_argument('--labels', help='JSON file mapping file name -> expected total')
+    parser.add_argument('--edges', type=int, nargs='+', default=[1024, 1600, 2048], help='Target long edges to try')
+    parser.add_argument('--crop', action='store_true', help='Also crop to the receipt region')
+    parser.add_argument('--deskew', action='store_true', help='Also deskew')
+    args = parser.parse_args()
+
+    files = sorted(
+        os.path.join(args.folder, f) for f in os.listdir(args.folder)
+        if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS
+    )
+    if not files:
+        parser.error(f"No images found in {args.folder}")
+
+    print(f"⏳ Loading OCR models...")
+    warm_up_readers()
+
+    configs = [("raw", preprocess_config(enabled=False))]
+    for edge in args.edges:
+        label = f"edge={edge}" + (" +crop" if args.crop else "") + (" +deskew" if args.deskew else "")
+        configs.append((label, preprocess_config(enabled=True, max_long_edge=edge, crop=args.crop, deskew=args.deskew)))
+
+    runs = []
+    for name, config in configs:
+        print(f"🔍 Running {name} over {len(files)} receipts...")
+        runs.append(run_config(name, files, config))
+
+    raw = runs[0]
+    expected = raw["totals"]
+    if args.labels:
+        with open(args.labels) as f:
+            expected = json.load(f)
+
+    print(f"\n📊 Results ({len(files)} receipts, accuracy {'vs labels' if args.labels else 'vs raw run'}):")
+    print(f"{'config':<28}{'s/receipt':>10}{'speedup':>9}{'total acc':>11}")
+    for run in runs:
+        per_receipt = run["elapsed"] / len(files)
+        speedup = raw["elapsed"] / run["elapsed"] if run["elapsed"] else 0
+        acc = accuracy(run["totals"], expected)
+        acc_text = f"{acc * 100:.1f}%" if acc is not None else "n/a"
+        print(f"{run['name']:<28}{per_receipt:>10.3f}{speedup:>8.2f}x{acc_text:>11}")
+        stages = ", ".join(f"{stage} {seconds / len(files) * 1000:.0f}ms" for stage, seconds in sorted(run["stages"].items()))
+        print(f"    {stages}")
+
+
+if __name__ == '__main__':
+    main()
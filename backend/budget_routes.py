@@ -2,7 +2,7 @@
 from flask import jsonify, request
 from models import db, Budget, Expense
 from datetime import datetime
-from sqlalchemy import or_, func
+from sqlalchemy import func
 
 def register_budget_routes(app, token_required):
     """Register budget-related routes"""
@@ -76,26 +76,23 @@ def register_budget_routes(app, token_required):
         # Get all budgets for this month
         budgets = Budget.query.filter_by(user_id=current_user.id, month=month).all()
         
+        # Spending per category for the month in one grouped query on the normalized
+        # (user_id, month, category_key) index; 'All' budgets use the month's total
+        spent_by_category = dict(
+            db.session.query(Expense.category_key, func.sum(Expense.amount))
+            .filter(Expense.user_id == current_user.id, Expense.month == month)
+            .group_by(Expense.category_key)
+            .all()
+        ) if budgets else {}
+        month_total = sum(spent_by_category.values())
+        
         alerts = []
         for budget in budgets:
-            # Calculate total spending for this month, support 'All' category and robust month detection
-            # Prefer matching YYYY-MM prefix on Expense.date, fallback to created_at month
-            month_prefix = f"{month}"
-
-            base_filters = [
-                Expense.user_id == current_user.id,
-                # Month filter: either the string date starts with YYYY-MM or created_at matches month
-                or_(
-                    Expense.date.like(f"{month_prefix}%"),
-                    func.strftime('%Y-%m', Expense.created_at) == month
-                )
-            ]
-
-            # Category filter: 'All' means no category filter
-            if budget.category.lower() != 'all':
-                base_filters.append(func.lower(Expense.category) == budget.category.lower())
-
-            total_spent = db.session.query(func.coalesce(func.sum(Expense.amount), 0.0)).filter(*base_filters).scalar() or 0.0
+            category_key = budget.category.lower()
+            if category_key == 'all':
+                total_spent = month_total
+            else:
+                total_spent = spent_by_category.get(category_key) or 0.0
             
             percentage = (total_spent / budget.monthly_limit * 100) if budget.monthly_limit > 0 else 0
             
@@ -0,0 +1,252 @@
+"""
+Expense categorization with the trained TF-IDF vectorizer + Naive Bayes model.
+
+Every request path goes through `categorize_many`, which vectorizes all texts
+into one sparse matrix and calls `predict_proba` once; the label, confidence
+and top-k alternatives are all derived from that single probability matrix.
+
+Probability rows are memoized in a bounded LRU keyed on the normalized text and
+the model version, and the cache is cleared whenever the model is (re)loaded.
+
+The model is loaded on first use; call `load_model()` up front to preload it.
+When the compiled artifact written by ml_model.py is present it is scored with
+NumPy alone (see compiled_model.py); otherwise the pickles are loaded, and only
+then are joblib/scikit-learn imported.
+
+With a model registry (model_registry.py) the version named by its CURRENT
+pointer is loaded, and each process re-reads the pointer every
+MODEL_RELOAD_INTERVAL seconds, loading a newly activated version beside the
+old one and swapping it in with a single assignment. Requests in flight finish
+on the version they started with.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+import model_registry
+from compiled_model import COMPILED_MODEL_PATH, CompiledCategorizer
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = 'expense_categorizer_model.pkl'
+VECTORIZER_PATH = 'vectorizer.pkl'
+
+# Map receipt types (from OCR) to category hints
+RECEIPT_CATEGORY_HINTS = {
+    'grocery': 'Supermarket groceries food shopping',
+    'restaurant': 'Restaurant dining food meal',
+    'fuel': 'Petrol fuel gas station transport',
+    'utilities': 'Electricity water gas utility bill payment',
+    'pharmacy': 'Pharmacy medicine medical healthcare',
+    'transportation': 'Taxi uber ride transport fare',
+    'online': 'Online purchase shopping order',
+}
+
+# Memory-map the models' numpy arrays instead of copying them into each process,
+# so every worker shares one page-cache copy
+CATEGORIZER_MMAP = os.environ.get('CATEGORIZER_MMAP', '1') == '1'
+
+# Seconds between checks of the model registry's CURRENT pointer; 0 disables hot reload
+MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', '5'))
+
+# Number of distinct texts whose probabilities are memoized
+CATEGORIZE_CACHE_SIZE = int(os.environ.get('CATEGORIZE_CACHE_SIZE', '4096'))
+
+# Active model snapshot; replaced as a whole so a request never mixes versions
+Loaded = namedtuple('Loaded', 'model vectorizer version')
+_active = None
+
+_load_lock = threading.Lock()
+_last_check = 0.0  # monotonic time the registry's CURRENT pointer was last read
+
+_cache = OrderedDict()  # (normalized text, model_version) -> probability row
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _file_digest(*paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def _read_model(model_path, vectorizer_path, compiled_path, version=None):
+    if compiled_path and os.path.exists(compiled_path):
+        # The compiled artifact provides both transform() and predict_proba()
+        compiled = CompiledCategorizer(compiled_path)
+        return Loaded(compiled, compiled, version or _file_digest(compiled_path))
+
+    import joblib  # pulls in scikit-learn when unpickling; deferred until a model is needed
+    mmap_mode = 'r' if CATEGORIZER_MMAP else None
+    return Loaded(
+        joblib.load(model_path, mmap_mode=mmap_mode),
+        joblib.load(vectorizer_path, mmap_mode=mmap_mode),
+        version or _file_digest(model_path, vectorizer_path),
+    )
+
+
+def _publish(loaded):
+    global _active
+    _active = loaded
+    clear_cache()
+
+
+def load_model(model_path=MODEL_PATH, vectorizer_path=VECTORIZER_PATH, compiled_path=COMPILED_MODEL_PATH):
+    """Load the active model, dropping memoized results.
+
+    The registry's CURRENT version wins; without one, the files at the given
+    paths are loaded.
+    """
+    global _last_check
+    version = model_registry.current_version()
+    _last_check = time.monotonic()
+    if version:
+        _publish(_load_version(version))
+    else:
+        _publish(_read_model(model_path, vectorizer_path, compiled_path))
+
+
+def _load_version(version):
+    directory = model_registry.version_dir(version)
+    return _read_model(
+        os.path.join(directory, os.path.basename(MODEL_PATH)),
+        os.path.join(directory, os.path.basename(VECTORIZER_PATH)),
+        os.path.join(directory, os.path.basename(COMPILED_MODEL_PATH)),
+        version=version,
+    )
+
+
+def reload_model():
+    """Swap to the registry's CURRENT version if it differs from the loaded one."""
+    global _last_check
+    with _load_lock:
+        _last_check = time.monotonic()
+        version = model_registry.current_version()
+        if not version or (_active is not None and _active.version == version):
+            return False
+        try:
+            loaded = _load_version(version)
+        except Exception:
+            # Keep serving the previous model; the next check retries
+            logger.exception("Could not load model version %s", version)
+            return False
+        _publish(loaded)
+        logger.info("Categorization model switched to %s", version)
+        return True
+
+
+def ensure_model():
+    """Load the model on first use and pick up newly activated versions."""
+    if _active is None:
+        with _load_lock:
+            if _active is None:
+                load_model()
+    elif MODEL_RELOAD_INTERVAL > 0 and time.monotonic() - _last_check >= MODEL_RELOAD_INTERVAL:
+        reload_model()
+    return _active
+
+
+def current_model_version():
+    return _active.version if _active is not None else None
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def cache_stats():
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["size"] = len(_cache)
+    stats["max_size"] = CATEGORIZE_CACHE_SIZE
+    stats["model_version"] = current_model_version()
+    return stats
+
+
+def _normalize(text):
+    # The vectorizer lowercases and splits on word characters, so case and
+    # whitespace differences never change the prediction
+    return " ".join(text.lower().split())
+
+
+def _predict_proba(active, texts):
+    """Probability rows for `texts`, scoring only cache misses (in one batch)."""
+    version = active.version
+    keys = [(_normalize(t), version) for t in texts]
+    rows = [None] * len(texts)
+    missing = {}  # key -> positions needing that key
+    with _cache_lock:
+        for i, key in enumerate(keys):
+            row = _cache.get(key)
+            if row is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                _cache.move_to_end(key)
+                rows[i] = row
+        _cache_stats["hits"] += len(texts) - sum(len(p) for p in missing.values())
+        _cache_stats["misses"] += sum(len(p) for p in missing.values())
+
+    if missing:
+        miss_keys = list(missing)
+        proba = active.model.predict_proba(active.vectorizer.transform([texts[missing[k][0]] for k in miss_keys]))
+        with _cache_lock:
+            for key, row in zip(miss_keys, proba):
+                for i in missing[key]:
+                    rows[i] = row
+                _cache[key] = row
+            while len(_cache) > CATEGORIZE_CACHE_SIZE:
+                _cache.popitem(last=False)
+                _cache_stats["evictions"] += 1
+    return np.vstack(rows)
+
+
+def categorization_text(text, receipt_type='', vendor=''):
+    """Build the text actually scored, using OCR receipt_type/vendor hints when present."""
+    receipt_type = (receipt_type or '').lower()
+    result = text
+    if receipt_type:
+        # Use the hint if available, otherwise combine vendor + receipt_type
+        if receipt_type in RECEIPT_CATEGORY_HINTS:
+            result = RECEIPT_CATEGORY_HINTS[receipt_type]
+        elif vendor:
+            result = f"{vendor} {receipt_type}"
+
+    # Limit text length to avoid confusion (use first 100 chars or smart text)
+    if len(result) > 200:
+        # If it's very long (full receipt text), use first few meaningful lines
+        lines = result.split('\n')
+        result = ' '.join(lines[:3])[:100]
+    return result
+
+
+def categorize_many(texts, top_k=3):
+    """Categorize many texts with one transform and one predict_proba call."""
+    if not texts:
+        return []
+    active = ensure_model()
+    proba = _predict_proba(active, texts)
+    classes = active.model.classes_
+    k = max(1, min(top_k, len(classes)))
+    # Top-k class indices per row, best first
+    top = np.argsort(-proba, axis=1)[:, :k]
+    results = []
+    for row, indices in zip(proba, top):
+        results.append({
+            "category": str(classes[indices[0]]),
+            "confidence": float(row[indices[0]]),
+            "top": [{"category": str(classes[i]), "confidence": float(row[i])} for i in indices],
+            "model_version": active.version,
+        })
+    return results
+
+
+def categorize(text, top_k=3):
+    return categorize_many([text], top_k=top_k)[0]
@@ -0,0 +1,103 @@
+"""
+Dependency-free inference format for the categorizer.
+
+`export_compiled` flattens a fitted TfidfVectorizer + MultinomialNB pair into a
+plain .npz file: the vocabulary (in feature-index order), idf vector, stop
+words and analyzer settings, plus the class labels, log-priors and feature
+log-probabilities. `CompiledCategorizer` loads it with NumPy alone and
+reproduces `vectorizer.transform` + `model.predict_proba`, so serving never
+imports scikit-learn or unpickles the vectorizer's analyzer.
+
+The file holds only numeric and string arrays and is read with
+allow_pickle=False.
+"""
+import re
+
+import numpy as np
+
+COMPILED_MODEL_PATH = 'categorizer_compiled.npz'
+FORMAT_VERSION = 1
+
+
+def export_compiled(model, vectorizer, path=COMPILED_MODEL_PATH):
+    """Write the arrays needed to score texts without scikit-learn."""
+    if (vectorizer.analyzer != 'word' or vectorizer.strip_accents is not None
+            or vectorizer.preprocessor is not None or vectorizer.tokenizer is not None):
+        raise ValueError("Only the default word analyzer can be compiled")
+    if not vectorizer.use_idf or vectorizer.norm not in ('l2', None):
+        raise ValueError("Only idf-weighted, l2 or unnormalized vectorizers can be compiled")
+    if vectorizer.binary or vectorizer.input != 'content' or np.dtype(vectorizer.dtype) != np.float64:
+        raise ValueError("binary, file input and non-float64 vectorizers cannot be compiled")
+    vocabulary = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    stop_words = sorted(vectorizer.get_stop_words() or ())
+    np.savez(
+        path,
+        format_version=np.array(FORMAT_VERSION),
+        vocabulary=np.array(vocabulary, dtype=str),
+        idf=np.asarray(vectorizer.idf_, dtype=np.float64),
+        stop_words=np.array(stop_words, dtype=str),
+        token_pattern=np.array(vectorizer.token_pattern),
+        ngram_range=np.array(vectorizer.ngram_range),
+        lowercase=np.array(vectorizer.lowercase),
+        sublinear_tf=np.array(vectorizer.sublinear_tf),
+        norm=np.array(vectorizer.norm or ''),
+        classes=np.array([str(c) for c in model.classes_], dtype=str),
+        class_log_prior=np.asarray(model.class_log_prior_, dtype=np.float64),
+        feature_log_prob=np.asarray(model.feature_log_prob_, dtype=np.float64),
+    )
+
+
+class CompiledCategorizer:
+    """NumPy-only stand-in for the fitted vectorizer and model."""
+
+    def __init__(self, path=COMPILED_MODEL_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format_version']) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported compiled model format in {path}")
+            self.vocabulary = {term: i for i, term in enumerate(data['vocabulary'].tolist())}
+            self.idf = data['idf']
+            self.stop_words = frozenset(data['stop_words'].tolist())
+            self.token_pattern = re.compile(str(data['token_pattern']))
+            self.ngram_range = tuple(int(n) for n in data['ngram_range'])
+            self.lowercase = bool(data['lowercase'])
+            self.sublinear_tf = bool(data['sublinear_tf'])
+            self.norm = str(data['norm']) or None
+            self.classes_ = data['classes']
+            self.class_log_prior = data['class_log_prior']
+            # Transposed once so scoring is a single (n, features) @ (features, classes) product
+            self.feature_log_prob_t = np.ascontiguousarray(data['feature_log_prob'].T)
+
+    def _ngrams(self, text):
+        if self.lowercase:
+            text = text.lower()
+        tokens = [t for t in self.token_pattern.findall(text) if t not in self.stop_words]
+        low, high = self.ngram_range
+        for n in range(low, min(high, len(tokens)) + 1):
+            for i in range(len(tokens) - n + 1):
+                yield tokens[i] if n == 1 else " ".join(tokens[i:i + n])
+
+    def transform(self, texts):
+        """Dense TF-IDF matrix matching TfidfVectorizer.transform."""
+        X = np.zeros((len(texts), len(self.idf)))
+        for row, text in enumerate(texts):
+            for gram in self._ngrams(text):
+                index = self.vocabulary.get(gram)
+                if index is not None:
+                    X[row, index] += 1
+        if self.sublinear_tf:
+            counted = X > 0
+            X[counted] = np.log(X[counted]) + 1
+        X *= self.idf
+        if self.norm == 'l2':
+            norms = np.sqrt(np.einsum('ij,ij->i', X, X))
+            norms[norms == 0] = 1
+            X /= norms[:, None]
+        return X
+
+    def predict_proba(self, X):
+        """Class probabilities matching MultinomialNB.predict_proba."""
+        jll = X @ self.feature_log_prob_t + self.class_log_prior
+        jll -= jll.max(axis=1, keepdims=True)
+        np.exp(jll, out=jll)
+        jll /= jll.sum(axis=1, keepdims=True)
+        return jll
@@ -0,0 +1,89 @@
+"""
+Database engine configuration.
+
+DATABASE_URL selects the database (default: SQLite file expense_tracker.db).
+SQLite connections are switched to WAL journaling with a busy timeout so
+several gunicorn workers can write without 'database is locked' errors;
+PostgreSQL (and other server databases) get a sized, pre-pinged connection pool.
+"""
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import GenericFunction
+from sqlalchemy.types import Date
+
+DEFAULT_DATABASE_URL = 'sqlite:///expense_tracker.db'
+
+# SQLite connection settings
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+
+# Connection pool settings for server databases
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))
+
+
+def database_url():
+    url = os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URL)
+    # Heroku-style URLs use the scheme SQLAlchemy dropped in 1.4
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(url):
+    """SQLALCHEMY_ENGINE_OPTIONS for the given database URL."""
+    if url.startswith('sqlite'):
+        # Wait in the driver as well as via PRAGMA busy_timeout
+        return {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_pre_ping': True,
+        'pool_recycle': DB_POOL_RECYCLE,
+    }
+
+
+def configure_database(app):
+    """Point the app at DATABASE_URL with engine options for its backend."""
+    url = database_url()
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+
+
+def dispose_engine_after_fork(engine):
+    """Give forked workers (gunicorn preload) fresh connections instead of sharing the parent's."""
+    os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE}')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+    cursor.close()
+
+
+class week_start(GenericFunction):
+    """Monday of the week containing a date, on SQLite and PostgreSQL."""
+    type = Date()
+    inherit_cache = True
+
+
+@compiles(week_start)
+def _week_start_default(element, compiler, **kw):
+    return 'CAST(date_trunc(\'week\', %s) AS DATE)' % compiler.process(element.clauses, **kw)
+
+
+@compiles(week_start, 'sqlite')
+def _week_start_sqlite(element, compiler, **kw):
+    # Forward to the next Sunday (or stay on it), then back to its Monday
+    return "date(%s, 'weekday 0', '-6 days')" % compiler.process(element.clauses, **kw)
@@ -0,0 +1,31 @@
+"""
+Query-string filters shared by the expense listing endpoints.
+"""
+from datetime import date
+
+from models import Expense
+
+
+def parse_expense_filters(args):
+    """Turn request args into SQLAlchemy conditions on Expense.
+
+    Supported: date_from / date_to (YYYY-MM-DD, inclusive, on the parsed spend
+    date), category (comma separated, case-insensitive), vendor (substring,
+    case-insensitive), min_amount / max_amount. Raises ValueError on malformed
+    values.
+    """
+    conditions = []
+    if args.get('date_from'):
+        conditions.append(Expense.spend_date >= date.fromisoformat(args['date_from']))
+    if args.get('date_to'):
+        conditions.append(Expense.spend_date <= date.fromisoformat(args['date_to']))
+    if args.get('category'):
+        categories = [c.strip().lower() for c in args['category'].split(',') if c.strip()]
+        conditions.append(Expense.category_key.in_(categories))
+    if args.get('vendor'):
+        conditions.append(Expense.vendor.ilike(f"%{args['vendor']}%"))
+    if args.get('min_amount'):
+        conditions.append(Expense.amount >= float(args['min_amount']))
+    if args.get('max_amount'):
+        conditions.append(Expense.amount <= float(args['max_amount']))
+    return conditions
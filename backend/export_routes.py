@@ -0,0 +1,132 @@
+# Export routes - stream a user's expenses as CSV, NDJSON or Parquet
+import csv
+import importlib.util
+import io
+import json
+from datetime import datetime
+
+from flask import Response, jsonify, request, stream_with_context
+from models import db, Expense
+from expense_filters import parse_expense_filters
+
+# Parquet export is optional; pyarrow is only imported when a Parquet export runs
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+# Rows fetched per server-side cursor batch (and per Parquet row group)
+EXPORT_BATCH_SIZE = 5000
+
+EXPORT_COLUMNS = ('id', 'date', 'spend_date', 'vendor', 'description', 'amount', 'category', 'created_at')
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def _iter_batches(query):
+    """Yield lists of row tuples, never holding more than one batch in memory."""
+    batch = []
+    for row in query.execution_options(yield_per=EXPORT_BATCH_SIZE):
+        batch.append(row)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def _csv_stream(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_stream(batches):
+    for batch in batches:
+        yield ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=_isoformat) + '\n' for row in batch)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written so far; tell() keeps counting for Parquet offsets."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet_stream(batches):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([
+        ('id', pa.int64()), ('date', pa.string()), ('spend_date', pa.date32()),
+        ('vendor', pa.string()), ('description', pa.string()), ('amount', pa.float64()),
+        ('category', pa.string()), ('created_at', pa.timestamp('us')),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for batch in batches:
+        # One row group per batch, built column-wise
+        columns = list(zip(*batch))
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+EXPORT_WRITERS = {'csv': _csv_stream, 'ndjson': _ndjson_stream, 'parquet': _parquet_stream}
+
+
+def register_export_routes(app, token_required):
+    """Register expense export routes"""
+
+    @app.route('/export', methods=['GET'])
+    @token_required
+    def export_expenses(current_user):
+        """Stream the user's expenses (oldest first) as ?format=csv|ndjson|parquet; accepts the /list filters"""
+        fmt = request.args.get('format', 'csv').lower()
+        if fmt not in EXPORT_WRITERS:
+            return jsonify({"error": f"format must be one of {', '.join(EXPORT_WRITERS)}"}), 400
+        if fmt == 'parquet' and not HAS_PYARROW:
+            return jsonify({"error": "Parquet export requires pyarrow"}), 501
+        try:
+            filters = parse_expense_filters(request.args)
+        except ValueError:
+            return jsonify({"error": "Invalid filter"}), 400
+
+        # Plain column tuples: no ORM objects or identity map growing with the history
+        query = db.session.query(*[getattr(Expense, c) for c in EXPORT_COLUMNS]) \
+            .filter(Expense.user_id == current_user.id, *filters).order_by(Expense.id)
+        filename = f"expenses-{datetime.utcnow():%Y%m%d}.{fmt}"
+        return Response(
+            stream_with_context(EXPORT_WRITERS[fmt](_iter_batches(query))),
+            mimetype=EXPORT_MIMETYPES[fmt],
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+        )
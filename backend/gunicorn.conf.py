@@ -0,0 +1,41 @@
+"""
+Gunicorn settings: `gunicorn -c gunicorn.conf.py` (serves app:app).
+
+With GUNICORN_PRELOAD=1 (the default) the master process builds the app and
+loads the categorization model once (PRELOAD_MODELS=1), freezes the GC and
+then forks the workers, which share those pages copy-on-write instead of each
+holding its own copy. Check with `python memory_report.py <master pid>`.
+
+EasyOCR runs in separate spawned processes, which cannot share the master's
+pages, so with OCR_PRELOAD=1 each worker starts its own warm pool in post_fork
+and the master never loads OCR models.
+"""
+import gc
+import os
+import sys
+
+wsgi_app = 'app:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', '4'))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+pidfile = os.environ.get('GUNICORN_PIDFILE')
+
+if preload_app:
+    os.environ.setdefault('PRELOAD_MODELS', '1')
+# Lets each worker size its batch OCR pool to its share of the cores (see ocr_jobs.py)
+os.environ['GUNICORN_WORKERS'] = str(workers)
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the collector's reach: a GC pass in a
+    # worker would otherwise write to those objects and un-share their pages
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # Without preload the app isn't built yet; the worker then warms up on its first request
+    ocr_jobs = sys.modules.get('ocr_jobs')
+    if ocr_jobs is not None:
+        ocr_jobs.warm_up_workers()
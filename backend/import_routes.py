@@ -0,0 +1,344 @@
+# Import routes - bulk expense import from bank statements (CSV / OFX)
+import csv
+import io
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from flask import jsonify, request
+from sqlalchemy import or_
+from models import db, Expense, expense_keys
+from categorizer import categorization_text, categorize_many
+from rollups import add_to_rollup
+
+# Rows parsed, categorized and inserted per transaction
+IMPORT_CHUNK_SIZE = 2000
+# Upper bound on rows accepted by one /import request
+IMPORT_MAX_ROWS = 100000
+# Per-row duplicates/errors listed in the response (counts are always complete)
+IMPORT_REPORT_LIMIT = 100
+
+# Header names recognized in CSV statements, lower-cased
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'posted date', 'posting date', 'value date', 'txn date'),
+    'amount': ('amount', 'transaction amount', 'value'),
+    'debit': ('debit', 'debit amount', 'withdrawal', 'withdrawals', 'money out', 'paid out'),
+    'credit': ('credit', 'credit amount', 'deposit', 'deposits', 'money in', 'paid in'),
+    'vendor': ('vendor', 'payee', 'merchant', 'name', 'counterparty'),
+    'description': ('description', 'details', 'memo', 'narrative', 'particulars', 'reference'),
+    'category': ('category',),
+}
+
+_OFX_TRANSACTION_RE = re.compile(r'<STMTTRN>(.*?)</STMTTRN>', re.S | re.I)
+_OFX_FIELD_RE = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+class SkipRow(Exception):
+    """Row is valid but not an expense (e.g. a credit)."""
+
+
+_CURRENCY = r"(?:rs|lkr|inr|usd|eur|gbp|aud|cad|sgd|[$€£¥₹])\.?"
+_AMOUNT_RE = re.compile(
+    rf"(?i)^\(?\s*([-+])?\s*(?:{_CURRENCY})?\s*([-+])?\s*(\d[\d.,' ]*)\s*(?:{_CURRENCY})?\s*(-)?\s*\)?$"
+)
+
+
+def _parse_number(digits):
+    """'1,250.50' / '1.234,56' / '1 234' -> float; the last of two different separators is the decimal one."""
+    digits = digits.replace(' ', '').replace("'", '')
+    last_dot, last_comma = digits.rfind('.'), digits.rfind(',')
+    if last_dot >= 0 and last_comma >= 0:
+        decimal = '.' if last_dot > last_comma else ','
+    elif last_comma >= 0:
+        groups = digits.split(',')
+        # '1,250' / '1,234,567' are thousands; '12,5' / '99,50' are decimal commas
+        decimal = None if len(groups) > 2 or len(groups[-1]) == 3 else ','
+    elif digits.count('.') > 1:
+        decimal = None  # '1.234.567'
+    else:
+        decimal = '.'
+    thousands = {'.', ','} - {decimal}
+    for separator in thousands:
+        digits = digits.replace(separator, '')
+    return float(digits.replace(',', '.') if decimal == ',' else digits)
+
+
+def parse_amount(value):
+    """'1,250.50' -> 1250.5, 'Rs. 99' -> 99.0, '$1.234,56' -> 1234.56, '(20.00)' / 'Rs. -5' -> negative."""
+    value = (value or '').strip().replace('\u2212', '-')
+    if not value:
+        return None
+    match = _AMOUNT_RE.match(value)
+    if not match:
+        raise ValueError(f"Unrecognized amount: {value!r}")
+    sign, inner_sign, digits, trailing_minus = match.groups()
+    negative = (value.startswith('(') and value.endswith(')')) or '-' in (sign, inner_sign, trailing_minus)
+    number = _parse_number(digits)
+    return -number if negative else number
+
+
+def _csv_records(stream, signed):
+    """Yield (row_number, record) from a CSV statement; record is an Exception for bad rows."""
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline=''))
+    header = [h.strip().lower() for h in next(reader, [])]
+    columns = {}
+    for field, names in CSV_COLUMNS.items():
+        for name in names:
+            if name in header:
+                columns[field] = header.index(name)
+                break
+    if 'date' not in columns or not ({'amount', 'debit'} & set(columns)):
+        raise ValueError("CSV needs a date column and an amount or debit column")
+
+    def cell(row, field):
+        index = columns.get(field)
+        return row[index].strip() if index is not None and index < len(row) else ''
+
+    for row_number, row in enumerate(reader, start=2):
+        if not any(c.strip() for c in row):
+            continue
+        try:
+            if 'debit' in columns:
+                amount = parse_amount(cell(row, 'debit'))
+                if not amount:
+                    raise SkipRow("credit")
+            else:
+                amount = parse_amount(cell(row, 'amount'))
+                if amount is None:
+                    raise ValueError("Missing amount")
+                if signed and amount > 0:
+                    raise SkipRow("credit")
+            yield row_number, {
+                'date': cell(row, 'date'),
+                'amount': abs(amount),
+                'vendor': cell(row, 'vendor'),
+                'description': cell(row, 'description'),
+                'category': cell(row, 'category'),
+            }
+        except (ValueError, SkipRow) as e:
+            yield row_number, e
+
+
+def _ofx_records(stream):
+    """Yield (transaction_number, record) for each STMTTRN of an OFX/QFX statement."""
+    text = io.TextIOWrapper(stream, encoding='utf-8', errors='replace')
+    buffer = ''
+    number = 0
+    while True:
+        chunk = text.read(64 * 1024)
+        buffer += chunk
+        end = 0
+        for match in _OFX_TRANSACTION_RE.finditer(buffer):
+            end = match.end()
+            number += 1
+            fields = {k.upper(): v.strip() for k, v in _OFX_FIELD_RE.findall(match.group(1))}
+            try:
+                amount = float(fields.get('TRNAMT', ''))
+                if amount >= 0:
+                    raise SkipRow("credit")
+                posted = fields.get('DTPOSTED', '')[:8]
+                yield number, {
+                    'date': f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}" if len(posted) == 8 else posted,
+                    'amount': -amount,
+                    'vendor': fields.get('NAME', ''),
+                    'description': fields.get('MEMO', ''),
+                    'category': '',
+                }
+            except (ValueError, SkipRow) as e:
+                yield number, e
+        buffer = buffer[end:]
+        if not chunk:
+            break
+
+
+def _duplicate_key(spend_date, amount, vendor, description):
+    return spend_date, round(amount, 2), (vendor or description or '').strip().lower()
+
+
+class DuplicateIndex:
+    """How often each duplicate key occurs among the user's expenses stored before the import began.
+
+    Keys are loaded lazily per spend date. Repeats within the statement itself are
+    genuine (two identical coffees on one day), so the n-th occurrence of a key in
+    the file is only a duplicate when at least n such expenses were already stored.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.started_at = datetime.utcnow()
+        self.stored = Counter()
+        self.in_file = Counter()
+        self.loaded_dates = set()
+
+    def load(self, dates):
+        dates = set(dates) - self.loaded_dates
+        if not dates:
+            return
+        rows = db.session.query(Expense.spend_date, Expense.amount, Expense.vendor, Expense.description) \
+            .filter(Expense.user_id == self.user_id, Expense.spend_date.in_(dates),
+                    or_(Expense.created_at < self.started_at, Expense.created_at.is_(None)))
+        self.stored.update(_duplicate_key(*row) for row in rows)
+        self.loaded_dates |= dates
+
+    def is_duplicate(self, key):
+        self.in_file[key] += 1
+        return self.in_file[key] <= self.stored[key]
+
+    def is_repeat(self, key):
+        return self.in_file[key] > 1
+
+
+def import_chunk(user_id, chunk, seen, report):
+    """Categorize and bulk-insert one chunk of (row_number, record) in a single transaction.
+
+    `seen` is the import's DuplicateIndex.
+    """
+    now = datetime.utcnow()
+    rows = []
+    for row_number, record in chunk:
+        keys = expense_keys(record['date'], record['category'], now)
+        if keys['spend_date'] is None:
+            report.error(row_number, f"Unrecognized date: {record['date']!r}")
+            continue
+        rows.append((row_number, record, keys))
+
+    seen.load(keys['spend_date'] for _, _, keys in rows)
+    new_rows = []
+    for row_number, record, keys in rows:
+        key = _duplicate_key(keys['spend_date'], record['amount'], record['vendor'], record['description'])
+        if seen.is_duplicate(key):
+            report.duplicate(row_number, record)
+            continue
+        if seen.is_repeat(key):
+            report.repeat(row_number, record)
+        new_rows.append((record, keys))
+
+    # One vectorized categorization pass for every row that came without a category
+    uncategorized = [(record, keys) for record, keys in new_rows if not record['category']]
+    texts = [categorization_text(f"{r['vendor']} {r['description']}".strip() or 'unknown', vendor=r['vendor'])
+             for r, _ in uncategorized]
+    for (record, keys), result in zip(uncategorized, categorize_many(texts, top_k=1)):
+        record['category'] = result['category']
+        keys['category_key'] = result['category'].lower()
+
+    values = []
+    rollups = defaultdict(lambda: [0.0, 0, None])
+    for record, keys in new_rows:
+        category = record['category'][:50]
+        values.append({
+            'user_id': user_id,
+            'vendor': (record['vendor'] or record['description'])[:100],
+            'date': record['date'][:20],
+            'description': record['description'][:255],
+            'amount': record['amount'],
+            'category': category,
+            'created_at': now,
+            **keys,
+        })
+        entry = rollups[(keys['month'], keys['category_key'])]
+        entry[0] += record['amount']
+        entry[1] += 1
+        entry[2] = min(entry[2], category) if entry[2] is not None else category
+    if values:
+        db.session.execute(Expense.__table__.insert(), values)
+        for (month, category_key), (total, count, label) in rollups.items():
+            add_to_rollup(user_id, month, category_key, total, count, label=label)
+    db.session.commit()
+    report.imported += len(values)
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.duplicate_count = 0
+        self.repeat_count = 0
+        self.error_count = 0
+        self.duplicates = []
+        self.repeats = []
+        self.errors = []
+
+    @staticmethod
+    def _row(row_number, record):
+        return {"row": row_number, "date": record['date'], "amount": record['amount'],
+                "vendor": record['vendor'] or record['description']}
+
+    def duplicate(self, row_number, record):
+        self.duplicate_count += 1
+        if len(self.duplicates) < IMPORT_REPORT_LIMIT:
+            self.duplicates.append(self._row(row_number, record))
+
+    def repeat(self, row_number, record):
+        """Row matching an earlier row of the same file; imported, but listed for review."""
+        self.repeat_count += 1
+        if len(self.repeats) < IMPORT_REPORT_LIMIT:
+            self.repeats.append(self._row(row_number, record))
+
+    def error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < IMPORT_REPORT_LIMIT:
+            self.errors.append({"row": row_number, "error": message})
+
+    def to_dict(self):
+        return {
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "duplicate_count": self.duplicate_count,
+            "repeat_count": self.repeat_count,
+            "error_count": self.error_count,
+            "duplicates": self.duplicates,
+            "repeats": self.repeats,
+            "errors": self.errors,
+        }
+
+
+def register_import_routes(app, token_required):
+    """Register bank statement import routes"""
+
+    @app.route('/import', methods=['POST'])
+    @token_required
+    def import_expenses(current_user):
+        """Import expenses from a CSV or OFX/QFX statement.
+
+        Rows are streamed, categorized in bulk when they have no category and
+        inserted IMPORT_CHUNK_SIZE at a time. Credits are skipped (OFX, CSV with a
+        debit column, or signed=1 for CSVs where positive amounts are income).
+        Rows matching an already stored expense on date, amount and vendor are
+        reported as duplicates and left out. Rows repeating an earlier row of the
+        same file are imported and listed under `repeats`.
+        """
+        if 'file' not in request.files or request.files['file'].filename == '':
+            return jsonify({"error": "No file provided"}), 400
+        file = request.files['file']
+        fmt = (request.args.get('format') or request.form.get('format') or '').lower()
+        if not fmt:
+            fmt = 'ofx' if file.filename.lower().endswith(('.ofx', '.qfx')) else 'csv'
+        if fmt not in ('csv', 'ofx'):
+            return jsonify({"error": "format must be csv or ofx"}), 400
+        signed = (request.args.get('signed') or request.form.get('signed')) == '1'
+
+        report = ImportReport()
+        seen = DuplicateIndex(current_user.id)
+        chunk = []
+        try:
+            records = _ofx_records(file.stream) if fmt == 'ofx' else _csv_records(file.stream, signed)
+            for count, (row_number, record) in enumerate(records, start=1):
+                if count > IMPORT_MAX_ROWS:
+                    report.error(row_number, f"Row limit of {IMPORT_MAX_ROWS} reached; rest of file ignored")
+                    break
+                if isinstance(record, SkipRow):
+                    report.skipped += 1
+                elif isinstance(record, Exception):
+                    report.error(row_number, str(record))
+                else:
+                    chunk.append((row_number, record))
+                    if len(chunk) >= IMPORT_CHUNK_SIZE:
+                        import_chunk(current_user.id, chunk, seen, report)
+                        chunk = []
+            if chunk:
+                import_chunk(current_user.id, chunk, seen, report)
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({"error": str(e), **report.to_dict()}), 400
+
+        return jsonify(report.to_dict()), 201 if report.imported else 200
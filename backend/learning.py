@@ -0,0 +1,178 @@
+"""
+Incremental learning from user category corrections.
+
+`/update/<id>` records every category change in `category_corrections`. A
+background job (started LEARN_DELAY seconds after a correction, so edits made
+together share one update) loads the active registry version, folds the pending
+corrections in with `MultinomialNB.partial_fit` over the model's fixed
+vocabulary, and publishes the result as a new registry version. Workers then
+switch to it through the usual hot reload, so no retrain or redeploy is needed.
+
+The model is shared by every user, so a correction is only learned once
+LEARN_MIN_USERS different users have moved the same text to the same category;
+until then it stays pending. Corrections to categories the model does not know
+are marked `skipped`: MultinomialNB cannot add classes after the first fit.
+Rolling a learned version back returns its corrections to the pending queue.
+"""
+import logging
+import os
+import tempfile
+import threading
+from collections import defaultdict
+
+import categorizer
+import model_registry
+from compiled_model import COMPILED_MODEL_PATH, export_compiled
+from models import db, CategoryCorrection
+
+logger = logging.getLogger(__name__)
+
+# Learn from corrections in the background as users make them; 0 leaves it to `flask models learn`
+LEARN_ON_CORRECTION = os.environ.get('LEARN_ON_CORRECTION', '1') == '1'
+# Seconds to let corrections accumulate before a background update
+LEARN_DELAY = float(os.environ.get('LEARN_DELAY', '30'))
+# Corrections passed to each partial_fit call
+LEARN_BATCH_SIZE = int(os.environ.get('LEARN_BATCH_SIZE', '500'))
+# Distinct users who must make the same correction before the shared model learns it
+LEARN_MIN_USERS = int(os.environ.get('LEARN_MIN_USERS', '2'))
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    global _timer, _timer_lock
+    _timer = None
+    _timer_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def record_correction(expense, old_category):
+    """Add a pending correction if `expense` moved to a different category (caller commits)."""
+    text = expense.description or expense.vendor
+    if not text or not expense.category:
+        return None
+    if (old_category or '').strip().lower() == expense.category.strip().lower():
+        return None
+    correction = CategoryCorrection(
+        user_id=expense.user_id,
+        expense_id=expense.id,
+        text=text[:255],
+        from_category=old_category,
+        to_category=expense.category.strip(),
+    )
+    db.session.add(correction)
+    return correction
+
+
+def _correction_key(text, category):
+    return " ".join(text.lower().split()), category.strip().lower()
+
+
+def _supporting_users():
+    """Distinct users behind each (text, category) among pending and learned corrections."""
+    users = defaultdict(set)
+    rows = (db.session.query(CategoryCorrection.text, CategoryCorrection.to_category, CategoryCorrection.user_id)
+            .filter(CategoryCorrection.status.in_(('pending', 'learned'))))
+    for text, category, user_id in rows:
+        users[_correction_key(text, category)].add(user_id)
+    return users
+
+
+def _load_base_model():
+    # Unpickled without mmap: partial_fit updates the count arrays in place
+    import joblib
+    version = model_registry.current_version()
+    directory = model_registry.version_dir(version) if version else '.'
+    model = joblib.load(os.path.join(directory, os.path.basename(categorizer.MODEL_PATH)))
+    vectorizer = joblib.load(os.path.join(directory, os.path.basename(categorizer.VECTORIZER_PATH)))
+    return model, vectorizer
+
+
+def learn_from_corrections(batch_size=None):
+    """Fold pending corrections into a new active model version.
+
+    Corrections without LEARN_MIN_USERS supporting users stay pending.
+    Returns (version or None, learned count, skipped count).
+    """
+    batch_size = batch_size or LEARN_BATCH_SIZE
+    with model_registry.update_lock():
+        pending = (CategoryCorrection.query.filter_by(status='pending')
+                   .order_by(CategoryCorrection.id).all())
+        if not pending:
+            return None, 0, 0
+        model, vectorizer = _load_base_model()
+        classes = {str(c).lower(): str(c) for c in model.classes_}
+        support = _supporting_users()
+        learned, skipped = [], []
+        for correction in pending:
+            label = classes.get(correction.to_category.strip().lower())
+            if not label:
+                skipped.append((correction, None))
+            elif len(support[_correction_key(correction.text, correction.to_category)]) >= LEARN_MIN_USERS:
+                learned.append((correction, label))
+
+        for start in range(0, len(learned), batch_size):
+            batch = learned[start:start + batch_size]
+            model.partial_fit(vectorizer.transform([c.text for c, _ in batch]), [label for _, label in batch])
+
+        version = None
+        if learned:
+            import joblib
+            with tempfile.TemporaryDirectory() as tmp:
+                paths = [os.path.join(tmp, os.path.basename(p)) for p in
+                         (categorizer.MODEL_PATH, categorizer.VECTORIZER_PATH, COMPILED_MODEL_PATH)]
+                joblib.dump(model, paths[0])
+                joblib.dump(vectorizer, paths[1])
+                export_compiled(model, vectorizer, paths[2])
+                version = model_registry.publish(paths)
+        for correction, _ in learned:
+            correction.status, correction.model_version = 'learned', version
+        for correction, _ in skipped:
+            correction.status = 'skipped'
+        db.session.commit()
+    return version, len(learned), len(skipped)
+
+
+def rollback_model():
+    """Re-activate the previous model version and return the corrections learned
+    into the one rolled back to the pending queue."""
+    with model_registry.update_lock():
+        rolled_back = model_registry.current_version()
+        previous = model_registry.rollback()
+        if rolled_back:
+            (CategoryCorrection.query
+             .filter_by(status='learned', model_version=rolled_back)
+             .update({'status': 'pending', 'model_version': None}, synchronize_session=False))
+            db.session.commit()
+    return previous
+
+
+def _run(app):
+    global _timer
+    with _timer_lock:
+        _timer = None
+    with app.app_context():
+        try:
+            version, learned, skipped = learn_from_corrections()
+            if version:
+                logger.info("Learned %d corrections (%d skipped) into model %s", learned, skipped, version)
+                categorizer.reload_model()
+        except Exception:
+            logger.exception("Learning from category corrections failed")
+        finally:
+            db.session.remove()
+
+
+def schedule_learning(app):
+    """Start a background update in LEARN_DELAY seconds unless one is already waiting."""
+    global _timer
+    if not LEARN_ON_CORRECTION:
+        return
+    with _timer_lock:
+        if _timer is None:
+            _timer = threading.Timer(LEARN_DELAY, _run, args=(app,))
+            _timer.daemon = True
+            _timer.start()
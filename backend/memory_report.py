@@ -0,0 +1,63 @@
+"""
+Per-process memory of a gunicorn master and its workers (Linux).
+
+Usage:
+    python memory_report.py <master pid>
+
+RSS counts shared pages in full for every process; PSS divides them between
+the processes sharing them, so sum(PSS) is what the deployment really uses.
+With preloading working, each worker's Shared figure is large and the PSS
+total is well below the RSS total.
+"""
+import argparse
+import os
+
+
+def smaps_rollup(pid):
+    """{field: kB} from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return fields
+
+
+def children(pid):
+    found = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The ppid follows the parenthesised command name
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            found.append(int(entry))
+    return sorted(found)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pid', type=int, help='Gunicorn master pid')
+    args = parser.parse_args()
+
+    processes = [('master', args.pid)] + [('worker', pid) for pid in children(args.pid)]
+    print(f"{'pid':>8} {'role':<7}{'RSS MB':>10}{'PSS MB':>10}{'Shared MB':>11}{'Private MB':>12}")
+    total_rss = total_pss = 0
+    for role, pid in processes:
+        m = smaps_rollup(pid)
+        shared = m.get('Shared_Clean', 0) + m.get('Shared_Dirty', 0)
+        private = m.get('Private_Clean', 0) + m.get('Private_Dirty', 0)
+        total_rss += m.get('Rss', 0)
+        total_pss += m.get('Pss', 0)
+        print(f"{pid:>8} {role:<7}{m.get('Rss', 0) / 1024:>10.1f}{m.get('Pss', 0) / 1024:>10.1f}"
+              f"{shared / 1024:>11.1f}{private / 1024:>12.1f}")
+    print(f"\nTotal RSS {total_rss / 1024:.1f} MB, total PSS {total_pss / 1024:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Batched, resumable data migrations.
+
+Each migration walks its table in primary-key order and commits after every
+batch, so writers are never blocked for longer than one short transaction.
+Progress is recorded in `schema_migrations`; an interrupted run resumes from
+the last committed batch. Runs at startup (unless MIGRATE_ON_STARTUP=0) and
+via `flask migrate run`.
+"""
+import os
+import time
+
+import click
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Expense, SchemaMigration
+from rollups import rebuild_rollups
+
+MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', '500'))
+
+
+def _state(name):
+    state = db.session.get(SchemaMigration, name)
+    if state is None:
+        db.session.add(SchemaMigration(name=name, last_id=0, done=False))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker started the same migration first; continue from its row
+            db.session.rollback()
+        state = db.session.get(SchemaMigration, name)
+    return state
+
+
+def migrate_expense_dates(batch_size=MIGRATION_BATCH_SIZE, pause=0.0):
+    """Backfill spend_date, month and category_key on existing expenses."""
+    state = _state('expense_spend_date')
+    while not state.done:
+        expenses = Expense.query.filter(Expense.id > state.last_id) \
+            .order_by(Expense.id).limit(batch_size).all()
+        if not expenses:
+            state.done = True
+            db.session.commit()
+            break
+        for expense in expenses:
+            expense.refresh_keys()
+        state.last_id = expenses[-1].id
+        db.session.commit()
+        if pause:
+            time.sleep(pause)
+    # Months of non-ISO dates moved with the new parser
+    rebuild_rollups()
+
+
+def migrate_rollup_category_keys(batch_size=MIGRATION_BATCH_SIZE, pause=0.0):
+    """Re-key the rollups on category_key (they were keyed on the category as typed)."""
+    state = _state('rollups_category_key')
+    rebuild_rollups()
+    state.done = True
+    db.session.commit()
+
+
+# Applied in order; each runs until its schema_migrations row is marked done
+MIGRATIONS = [
+    ('expense_spend_date', migrate_expense_dates),
+    ('rollups_category_key', migrate_rollup_category_keys),
+]
+
+
+def pending_migrations():
+    done = {m.name for m in SchemaMigration.query.filter_by(done=True)}
+    return [(name, func) for name, func in MIGRATIONS if name not in done]
+
+
+def run_migrations(**kwargs):
+    for name, func in pending_migrations():
+        func(**kwargs)
+        yield name
+
+
+def register_migration_commands(app):
+    """Register `flask migrate run|status`"""
+
+    @app.cli.group('migrate')
+    def migrate_cli():
+        """Run batched data migrations."""
+
+    @migrate_cli.command('run')
+    @click.option('--batch-size', default=MIGRATION_BATCH_SIZE, show_default=True)
+    @click.option('--pause', default=0.0, help='Seconds to sleep between batches.')
+    def run_command(batch_size, pause):
+        """Apply pending migrations."""
+        for name in run_migrations(batch_size=batch_size, pause=pause):
+            click.echo(f"Applied {name}")
+
+    @migrate_cli.command('status')
+    def status_command():
+        """Show migration progress."""
+        states = {m.name: m for m in SchemaMigration.query}
+        for name, _ in MIGRATIONS:
+            state = states.get(name)
+            if state is None:
+                click.echo(f"{name}: pending")
+            else:
+                click.echo(f"{name}: {'done' if state.done else f'in progress (last id {state.last_id})'}")
@@ -4,6 +4,10 @@ from sklearn.naive_bayes import MultinomialNB
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
+import numpy as np
+
+from compiled_model import COMPILED_MODEL_PATH, CompiledCategorizer, export_compiled
+from model_registry import publish
 
 # Enhanced training data with 290+ balanced samples for maximum accuracy
 data = {
@@ -145,6 +149,17 @@ for sample in test_samples:
 joblib.dump(model, 'expense_categorizer_model.pkl')
 joblib.dump(vectorizer, 'vectorizer.pkl')
 
+# Export the NumPy-only inference artifact served by categorizer.py, and check it scores identically
+export_compiled(model, vectorizer, COMPILED_MODEL_PATH)
+compiled = CompiledCategorizer(COMPILED_MODEL_PATH)
+expected = model.predict_proba(vectorizer.transform(df['description']))
+actual = compiled.predict_proba(compiled.transform(list(df['description'])))
+assert np.allclose(actual, expected, rtol=0, atol=1e-12), "Compiled model does not match scikit-learn"
+
+# Publish as a new registry version; running workers switch to it without a restart
+version = publish(['expense_categorizer_model.pkl', 'vectorizer.pkl', COMPILED_MODEL_PATH])
+
 print(f"\n✅ Model trained and saved successfully!")
+print(f"📦 Active model version: {version}")
 print(f"📈 Training samples: {len(df)}")
 print(f"🏷️  Categories: {', '.join(df['category'].unique())}")
\ No newline at end of file
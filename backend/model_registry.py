@@ -0,0 +1,158 @@
+"""
+Versioned model registry.
+
+Each trained model is published into its own directory under MODEL_REGISTRY_DIR
+(named `<UTC timestamp>-<content digest>`) and never modified afterwards:
+
+    models/
+        20251018-101500-3f2a9c1e/categorizer_compiled.npz, *.pkl
+        CURRENT    <- name of the active version
+        HISTORY    <- activated versions, oldest first (used by rollback)
+
+Publishing copies the files into a temporary directory and renames it into
+place, and CURRENT/HISTORY are rewritten through os.replace, so a reader never
+sees a half-written version or pointer. Running workers notice a changed
+CURRENT and swap models without a restart (see categorizer.py).
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR', 'models')
+
+CURRENT_FILE = 'CURRENT'
+HISTORY_FILE = 'HISTORY'
+LOCK_FILE = '.lock'
+
+
+class RegistryError(Exception):
+    pass
+
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(path) or '.'
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _read_lines(path):
+    try:
+        with open(path) as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def version_dir(version, registry=None):
+    return os.path.join(registry or MODEL_REGISTRY_DIR, version)
+
+
+def list_versions(registry=None):
+    """Published versions, oldest first."""
+    registry = registry or MODEL_REGISTRY_DIR
+    if not os.path.isdir(registry):
+        return []
+    return sorted(name for name in os.listdir(registry)
+                  if not name.startswith('.') and os.path.isdir(os.path.join(registry, name)))
+
+
+def current_version(registry=None):
+    """The active version, or None when nothing has been activated."""
+    lines = _read_lines(os.path.join(registry or MODEL_REGISTRY_DIR, CURRENT_FILE))
+    return lines[0] if lines else None
+
+
+def history(registry=None):
+    return _read_lines(os.path.join(registry or MODEL_REGISTRY_DIR, HISTORY_FILE))
+
+
+def publish(paths, registry=None, activate_version=True):
+    """Copy model files into a new immutable version and (by default) activate it."""
+    registry = registry or MODEL_REGISTRY_DIR
+    os.makedirs(registry, exist_ok=True)
+    digest = hashlib.sha256()
+    for path in sorted(paths, key=os.path.basename):
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    version = f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime())}-{digest.hexdigest()[:8]}"
+    target = version_dir(version, registry)
+    if not os.path.isdir(target):
+        staging = tempfile.mkdtemp(dir=registry, prefix='.tmp-')
+        try:
+            for path in paths:
+                shutil.copy2(path, os.path.join(staging, os.path.basename(path)))
+            os.rename(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+    if activate_version:
+        activate(version, registry)
+    return version
+
+
+def activate(version, registry=None):
+    """Point CURRENT at `version` and record it in HISTORY."""
+    registry = registry or MODEL_REGISTRY_DIR
+    if version not in list_versions(registry):
+        raise RegistryError(f"Unknown model version {version!r}")
+    entries = history(registry)
+    if not entries or entries[-1] != version:
+        entries.append(version)
+        _write_atomic(os.path.join(registry, HISTORY_FILE), "\n".join(entries) + "\n")
+    _write_atomic(os.path.join(registry, CURRENT_FILE), version + "\n")
+    return version
+
+
+def rollback(registry=None):
+    """Re-activate the version that was active before the current one."""
+    registry = registry or MODEL_REGISTRY_DIR
+    entries = history(registry)
+    current = current_version(registry)
+    while entries and entries[-1] == current:
+        entries.pop()
+    if not entries:
+        raise RegistryError("No earlier model version to roll back to")
+    previous = entries[-1]
+    if previous not in list_versions(registry):
+        raise RegistryError(f"Model version {previous!r} is no longer in the registry")
+    _write_atomic(os.path.join(registry, HISTORY_FILE), "\n".join(entries) + "\n")
+    _write_atomic(os.path.join(registry, CURRENT_FILE), previous + "\n")
+    return previous
+
+
+@contextmanager
+def update_lock(registry=None, timeout=60, stale_after=600):
+    """Serialize read-modify-publish cycles across processes (a lock file works on every OS)."""
+    registry = registry or MODEL_REGISTRY_DIR
+    os.makedirs(registry, exist_ok=True)
+    path = os.path.join(registry, LOCK_FILE)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > stale_after:
+                    os.remove(path)  # left behind by a process that died mid-update
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                raise RegistryError("Another model update is in progress")
+            time.sleep(0.1)
+    try:
+        yield
+    finally:
+        os.remove(path)
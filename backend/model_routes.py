@@ -0,0 +1,136 @@
+# Model registry admin routes and CLI - to be imported into app.py
+import os
+from functools import wraps
+
+import click
+from flask import jsonify, request
+
+import categorizer
+import model_registry
+from learning import learn_from_corrections, rollback_model
+from model_registry import RegistryError
+
+# Comma-separated emails allowed to manage models and read server stats
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get('ADMIN_EMAILS', '').split(',') if e.strip()}
+
+
+def admin_required(f):
+    """Restrict a token_required route to ADMIN_EMAILS (apply below @token_required)"""
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        if (current_user.email or '').lower() not in ADMIN_EMAILS:
+            return jsonify({"error": "Admin access required"}), 403
+        return f(current_user, *args, **kwargs)
+    return decorated
+
+
+def _registry_state():
+    return {
+        "current": model_registry.current_version(),
+        "loaded": categorizer.current_model_version(),
+        "versions": model_registry.list_versions(),
+        "history": model_registry.history(),
+    }
+
+
+def register_model_routes(app, token_required):
+    """Register model registry routes"""
+
+    @app.route('/models', methods=['GET'])
+    @token_required
+    @admin_required
+    def list_models(current_user):
+        """Registry versions, the active one and the one loaded in this worker"""
+        return jsonify(_registry_state())
+
+    @app.route('/models/activate', methods=['POST'])
+    @token_required
+    @admin_required
+    def activate_model(current_user):
+        """Activate a published version; every worker picks it up within MODEL_RELOAD_INTERVAL"""
+        version = (request.json or {}).get('version')
+        if not version:
+            return jsonify({"error": "version is required"}), 400
+        try:
+            model_registry.activate(version)
+        except RegistryError as e:
+            return jsonify({"error": str(e)}), 404
+        categorizer.reload_model()
+        return jsonify(_registry_state())
+
+    @app.route('/models/rollback', methods=['POST'])
+    @token_required
+    @admin_required
+    def rollback_model(current_user):
+        """Re-activate the previously active version; its learned corrections become pending again"""
+        try:
+            rollback_model()
+        except RegistryError as e:
+            return jsonify({"error": str(e)}), 409
+        categorizer.reload_model()
+        return jsonify(_registry_state())
+
+    @app.route('/models/learn', methods=['POST'])
+    @token_required
+    @admin_required
+    def learn_model(current_user):
+        """Fold pending category corrections into a new model version now"""
+        try:
+            version, learned, skipped = learn_from_corrections()
+        except RegistryError as e:
+            return jsonify({"error": str(e)}), 409
+        categorizer.reload_model()
+        return jsonify({"version": version, "learned": learned, "skipped": skipped, **_registry_state()})
+
+
+def register_model_commands(app):
+    """Register `flask models list|publish|activate|rollback|learn`"""
+
+    @app.cli.group('models')
+    def models_cli():
+        """Manage the categorization model registry."""
+
+    @models_cli.command('list')
+    def list_command():
+        """Show published versions, marking the active one."""
+        current = model_registry.current_version()
+        for version in model_registry.list_versions():
+            click.echo(f"{'*' if version == current else ' '} {version}")
+
+    @models_cli.command('publish')
+    @click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+    @click.option('--no-activate', is_flag=True, help='Publish without activating.')
+    def publish_command(paths, no_activate):
+        """Copy model files into a new version."""
+        version = model_registry.publish(paths, activate_version=not no_activate)
+        click.echo(f"Published {version}{'' if no_activate else ' (active)'}")
+
+    @models_cli.command('activate')
+    @click.argument('version')
+    def activate_command(version):
+        """Make VERSION the active model."""
+        try:
+            model_registry.activate(version)
+        except RegistryError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Activated {version}")
+
+    @models_cli.command('learn')
+    def learn_command():
+        """Fold pending category corrections into a new active version."""
+        try:
+            version, learned, skipped = learn_from_corrections()
+        except RegistryError as e:
+            raise click.ClickException(str(e))
+        if version:
+            click.echo(f"Learned {learned} corrections ({skipped} skipped) into {version}")
+        else:
+            click.echo(f"No new model: {learned} corrections learned, {skipped} skipped")
+
+    @models_cli.command('rollback')
+    def rollback_command():
+        """Re-activate the previously active version."""
+        try:
+            click.echo(f"Rolled back to {rollback_model()}")
+        except RegistryError as e:
+            raise click.ClickException(str(e))
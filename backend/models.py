@@ -1,13 +1,57 @@
 """
-Database models using Flask-SQLAlchemy with SQLite.
+Database models using Flask-SQLAlchemy (SQLite or PostgreSQL, see database.py).
 Production-ready with proper user isolation and password hashing.
 """
-from datetime import datetime
+import json
+import logging
+import re
+from datetime import date, datetime
+from functools import lru_cache
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event, inspect, text
+from passwords import hash_password, needs_rehash, verify_password
+
+logger = logging.getLogger(__name__)
 
 db = SQLAlchemy()
 
+def ensure_columns():
+    """Add columns declared on the models that are missing from existing tables.
+
+    Only nullable columns are added; `db.create_all()` never alters existing tables.
+    NOT NULL columns would need a default or backfill for the existing rows, so
+    they are skipped with a warning and need a migration of their own.
+    """
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                logger.warning("Not adding NOT NULL column %s.%s to the existing table; it needs a migration",
+                               table.name, column.name)
+                continue
+            column_type = column.type.compile(db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+    db.session.commit()
+
+def ensure_indexes():
+    """Create indexes declared on the models that are missing from existing tables.
+
+    `db.create_all()` only creates indexes together with new tables. Indexes over
+    columns that ensure_columns() could not add are skipped.
+    """
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if all(column.name in existing for column in index.columns):
+                index.create(bind=db.engine, checkfirst=True)
+
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -23,11 +67,15 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set the user's password."""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        """Verify the password against the hash."""
-        return check_password_hash(self.password_hash, password)
+        """Verify the password against the hash (on the bounded verification pool)."""
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """True if the stored hash predates the current PASSWORD_HASH_METHOD."""
+        return needs_rehash(self.password_hash)
     
     def to_dict(self):
         return {
@@ -48,18 +96,90 @@ class Expense(db.Model):
     amount = db.Column(db.Float, nullable=False)
     category = db.Column(db.String(50), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Normalized copies of date/category, kept in sync on every write (see set_expense_keys)
+    spend_date = db.Column(db.Date)  # `date` parsed by parse_spend_date; NULL if unparseable
+    month = db.Column(db.String(7))  # Format: YYYY-MM
+    category_key = db.Column(db.String(50))  # lower-cased category
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'vendor': self.vendor,
-            'date': self.date,
-            'description': self.description,
-            'amount': self.amount,
-            'category': self.category,
-            'created_at': self.created_at.isoformat()
-        }
+    __table_args__ = (
+        # Backs keyset pagination of a user's expenses, newest first
+        db.Index('ix_expenses_user_created_id', 'user_id', 'created_at', 'id'),
+        # Backs date range filters and sorting by spend date
+        db.Index('ix_expenses_user_spend_date', 'user_id', 'spend_date'),
+        # Backs per-month, per-category aggregates such as budget alerts
+        db.Index('ix_expenses_user_month_category', 'user_id', 'month', 'category_key'),
+    )
+    
+    DICT_FIELDS = ('id', 'user_id', 'vendor', 'date', 'spend_date', 'description', 'amount', 'category', 'created_at')
+    
+    def to_dict(self, fields=None):
+        """Serialize the expense; `fields` restricts the output (and attribute loads) to a subset."""
+        data = {name: getattr(self, name) for name in (fields or self.DICT_FIELDS)}
+        for name in ('spend_date', 'created_at'):
+            if data.get(name) is not None:
+                data[name] = data[name].isoformat()
+        return data
+
+    def derived_month(self):
+        """Month (YYYY-MM) the expense counts towards: its spend date, else when it was recorded."""
+        return expense_keys(self.date, self.category, self.created_at)['month']
+
+    def refresh_keys(self):
+        """Recompute spend_date, month and category_key from date and category."""
+        for name, value in expense_keys(self.date, self.category, self.created_at).items():
+            setattr(self, name, value)
+
+
+# Date formats seen in manual entry and OCR output (see ocr._DATE_RE):
+# YYYY-MM-DD / DD-MM-YYYY with -, / or . separators, and named months
+_YEAR_FIRST_RE = re.compile(r'^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})$')
+_DAY_FIRST_RE = re.compile(r'^(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})$')
+_NAMED_MONTH_RE = re.compile(r'^(\d{1,2})\s+([a-z]{3})[a-z]*\.?,?\s+(\d{4})$|^([a-z]{3})[a-z]*\.?\s+(\d{1,2}),?\s+(\d{4})$')
+_MONTHS = {m: i for i, m in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1)}
+
+@lru_cache(maxsize=4096)
+def parse_spend_date(value):
+    """Parse a free-form expense date ('2025-01-15', '15-01-2025', '15 Jan 2025', ...) into a date, or None."""
+    value = ' '.join((value or '').split()).lower()
+    if not value:
+        return None
+    if len(value) > 10 and value[4] == '-' and value[10] in 't ':
+        value = value[:10]  # ISO timestamp
+    match = _YEAR_FIRST_RE.match(value)
+    if match:
+        year, month, day = match.groups()
+    else:
+        match = _DAY_FIRST_RE.match(value)
+        if match:
+            day, month, year = match.groups()
+        else:
+            match = _NAMED_MONTH_RE.match(value)
+            if not match:
+                return None
+            day, name, year = match.group(1, 2, 3) if match.group(1) else match.group(5, 4, 6)
+            month = _MONTHS.get(name)
+            if month is None:
+                return None
+    try:
+        return date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+def expense_keys(date, category, created_at=None):
+    """Normalized columns for an expense; also used by bulk inserts that bypass the ORM."""
+    spend_date = parse_spend_date(date)
+    return {
+        'spend_date': spend_date,
+        # created_at is only filled in on flush for new rows
+        'month': (spend_date or created_at or datetime.utcnow()).strftime('%Y-%m'),
+        'category_key': (category or '').lower(),
+    }
+
+@event.listens_for(Expense, 'before_insert')
+@event.listens_for(Expense, 'before_update')
+def set_expense_keys(mapper, connection, expense):
+    expense.refresh_keys()
 
 
 class Budget(db.Model):
@@ -84,3 +204,96 @@ class Budget(db.Model):
             'month': self.month,
             'created_at': self.created_at.isoformat()
         }
+
+
+class MonthlyRollup(db.Model):
+    """Per-user spend per month and category, maintained alongside writes to expenses."""
+    __tablename__ = 'monthly_rollups'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # Format: YYYY-MM
+    category = db.Column(db.String(50), primary_key=True)  # the expenses' category_key (lower-cased)
+    label = db.Column(db.String(50))  # spelling shown for the category: the lowest in sort order seen
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'month': self.month,
+            'category': self.label or self.category,
+            'total': self.total,
+            'count': self.count
+        }
+
+
+class OcrJob(db.Model):
+    __tablename__ = 'ocr_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    filepath = db.Column(db.String(255), nullable=False)
+    content_hash = db.Column(db.String(64))  # SHA-256 of the uploaded file
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued | running | done | failed
+    result = db.Column(db.Text)  # JSON-encoded /upload payload
+    error = db.Column(db.Text)
+    claimed_by = db.Column(db.String(64))  # process running the job (see ocr_jobs._owner)
+    heartbeat_at = db.Column(db.DateTime)  # refreshed by the owner while the job runs
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class CategoryCorrection(db.Model):
+    """A user changing an expense's category; folded into the model by learning.py."""
+    __tablename__ = 'category_corrections'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    expense_id = db.Column(db.Integer)  # not a foreign key: the correction outlives a deleted expense
+    text = db.Column(db.String(255), nullable=False)  # description the model scores
+    from_category = db.Column(db.String(50))
+    to_category = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)  # pending | learned | skipped
+    model_version = db.Column(db.String(50))  # registry version that first included it
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'expense_id': self.expense_id,
+            'text': self.text,
+            'from_category': self.from_category,
+            'to_category': self.to_category,
+            'status': self.status,
+            'model_version': self.model_version,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class SchemaMigration(db.Model):
+    """Progress of a batched data migration (see migrations.py)."""
+    __tablename__ = 'schema_migrations'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)  # highest row id processed
+    done = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class OcrCacheEntry(db.Model):
+    __tablename__ = 'ocr_cache'
+    
+    content_hash = db.Column(db.String(64), primary_key=True)  # SHA-256 of the image
+    parser_version = db.Column(db.String(20), nullable=False)
+    result = db.Column(db.Text, nullable=False)  # JSON-encoded /upload payload
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -1,20 +1,252 @@
+import hashlib
+import json
+import os
+import queue
 import re
-from typing import Dict, Any, List, Tuple
+import threading
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
+from itertools import accumulate
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-import easyocr
+import numpy as np
+from PIL import Image, ImageOps
 
 
-def _amount_regexps() -> List[re.Pattern]:
-    """Common regex patterns to capture currency amounts in various locales."""
-    patterns = [
-        # e.g., Rs 1,234.56 or LKR 1,234.56 or $1,234.56 or €1.234,56
-        r"(?:\b(?:rs\.?|lkr|usd|eur|gbp|inr|aed|sar)\b)?\s*[\$₹£€]?[\s]*([0-9]{1,3}(?:[ ,][0-9]{3})*(?:[\.,][0-9]{2})|[0-9]+(?:[\.,][0-9]{2}))",
-        # plain number with decimals
-        r"\b([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})|[0-9]+\.[0-9]{2})\b",
-        # some locales use comma decimal
-        r"\b([0-9]{1,3}(?:\.[0-9]{3})*(?:,[0-9]{2}))\b",
-    ]
-    return [re.compile(p, re.IGNORECASE) for p in patterns]
+OCR_LANGUAGES = ['en']
+# Bump whenever extraction output changes; cached OCR results from other versions are discarded
+OCR_PARSER_VERSION = "4"
+# Number of EasyOCR readers kept loaded per process (each holds its own model weights)
+OCR_READER_POOL_SIZE = int(os.environ.get('OCR_READER_POOL_SIZE', '1'))
+
+
+class ReaderPool:
+    """Thread-safe pool of EasyOCR readers that are loaded once and reused by every OCR call."""
+
+    def __init__(self, size: int = 1, languages: Optional[List[str]] = None):
+        self.size = max(1, int(size))
+        self.languages = list(languages or OCR_LANGUAGES)
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._stats = {
+            "loads": 0,
+            "load_time_total": 0.0,
+            "hits": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "in_use": 0,
+        }
+
+    def _load(self):
+        import easyocr  # pulls in torch; only processes that actually run OCR pay for it
+        start = time.perf_counter()
+        reader = easyocr.Reader(self.languages)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats["loads"] += 1
+            self._stats["load_time_total"] += elapsed
+        return reader
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Take a reader from the pool, loading a new one while below `size`, else wait."""
+        try:
+            reader = self._idle.get_nowait()
+            with self._lock:
+                self._stats["hits"] += 1
+                self._stats["in_use"] += 1
+            return reader
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                reader = self._load()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        else:
+            start = time.perf_counter()
+            reader = self._idle.get(timeout=timeout)
+            with self._lock:
+                self._stats["waits"] += 1
+                self._stats["wait_time_total"] += time.perf_counter() - start
+        with self._lock:
+            self._stats["in_use"] += 1
+        return reader
+
+    def release(self, reader) -> None:
+        with self._lock:
+            self._stats["in_use"] -= 1
+        self._idle.put(reader)
+
+    @contextmanager
+    def reader(self, timeout: Optional[float] = None):
+        reader = self.acquire(timeout=timeout)
+        try:
+            yield reader
+        finally:
+            self.release(reader)
+
+    def warm_up(self, count: Optional[int] = None) -> None:
+        """Load up to `count` readers (default: the full pool) ahead of the first request."""
+        count = self.size if count is None else min(max(1, count), self.size)
+        readers = [self.acquire() for _ in range(count)]
+        for reader in readers:
+            self.release(reader)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["loaded"] = self._created
+        stats["idle"] = self._idle.qsize()
+        stats["load_time_avg"] = stats["load_time_total"] / stats["loads"] if stats["loads"] else 0.0
+        return stats
+
+
+_reader_pool: Optional[ReaderPool] = None
+_reader_pool_lock = threading.Lock()
+
+
+def get_reader_pool() -> ReaderPool:
+    """Return the process-wide reader pool, creating it on first use."""
+    global _reader_pool
+    if _reader_pool is None:
+        with _reader_pool_lock:
+            if _reader_pool is None:
+                _reader_pool = ReaderPool(size=OCR_READER_POOL_SIZE)
+    return _reader_pool
+
+
+def warm_up_readers(count: Optional[int] = None) -> Dict[str, Any]:
+    """Preload EasyOCR models so the first upload does not pay the load cost."""
+    pool = get_reader_pool()
+    pool.warm_up(count)
+    return pool.stats()
+
+
+def reader_pool_stats() -> Dict[str, Any]:
+    return get_reader_pool().stats()
+
+
+# Receipt preprocessing applied before OCR. Detector time grows with pixel count, so
+# phone photos are shrunk to `max_long_edge`; crop/deskew cost extra time per image.
+PREPROCESS_DEFAULTS: Dict[str, Any] = {
+    "enabled": os.environ.get('OCR_PREPROCESS', '1') == '1',
+    "exif_rotate": True,
+    "grayscale": True,
+    "max_long_edge": int(os.environ.get('OCR_MAX_LONG_EDGE', '1600')),  # 0 keeps full size
+    "crop": os.environ.get('OCR_CROP', '0') == '1',
+    "deskew": os.environ.get('OCR_DESKEW', '0') == '1',
+    "deskew_max_angle": 10.0,  # degrees
+}
+
+
+def preprocess_config(**overrides: Any) -> Dict[str, Any]:
+    config = dict(PREPROCESS_DEFAULTS)
+    config.update(overrides)
+    return config
+
+
+def ocr_result_version(config: Optional[Dict[str, Any]] = None) -> str:
+    """Parser version plus a digest of the preprocessing config, for keying cached results."""
+    config = config or PREPROCESS_DEFAULTS
+    digest = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:8]
+    return f"{OCR_PARSER_VERSION}-{digest}"
+
+
+def _receipt_box(gray: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """Bounding box of the bright paper region, assuming a receipt on a darker background."""
+    mask = gray > max(gray.mean(), 128)
+    rows = np.where(mask.mean(axis=1) > 0.3)[0]
+    cols = np.where(mask.mean(axis=0) > 0.3)[0]
+    if rows.size == 0 or cols.size == 0:
+        return None
+    top, bottom, left, right = int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1
+    # Keep the original when the detected region is implausibly small
+    if (bottom - top) * (right - left) < 0.2 * gray.size:
+        return None
+    margin = max(2, int(0.01 * max(gray.shape)))
+    height, width = gray.shape
+    return max(0, left - margin), max(0, top - margin), min(width, right + margin), min(height, bottom + margin)
+
+
+def _estimate_skew(gray: np.ndarray, max_angle: float) -> float:
+    """Projection-profile skew estimate: text rows are sharpest at the right angle."""
+    small = Image.fromarray(gray)
+    small.thumbnail((600, 600))
+    ink = Image.fromarray(((np.asarray(small) < 128) * 255).astype(np.uint8))
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + 0.01, 0.5):
+        profile = np.asarray(ink.rotate(float(angle), expand=False)).sum(axis=1, dtype=np.float64)
+        score = float(np.var(profile))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def preprocess_image(image_path: str, config: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, Dict[str, float]]:
+    """Load a receipt and normalize it for OCR; returns the pixel array and per-stage timings (s)."""
+    config = config or PREPROCESS_DEFAULTS
+    timings: Dict[str, float] = {}
+
+    start = time.perf_counter()
+    image = Image.open(image_path)
+    target = config.get("max_long_edge") or 0
+    if target and image.format == "JPEG":
+        # Let the JPEG decoder downscale by a power of two while decoding (much cheaper than a full decode)
+        image.draft("L" if config.get("grayscale") else "RGB", (target, target))
+    image.load()
+    timings["load"] = time.perf_counter() - start
+
+    if config.get("exif_rotate"):
+        start = time.perf_counter()
+        image = ImageOps.exif_transpose(image)
+        timings["exif_rotate"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    image = image.convert("L" if config.get("grayscale") else "RGB")
+    timings["convert"] = time.perf_counter() - start
+
+    if target and max(image.size) > target:
+        start = time.perf_counter()
+        image.thumbnail((target, target), Image.LANCZOS)
+        timings["resize"] = time.perf_counter() - start
+
+    if config.get("crop"):
+        start = time.perf_counter()
+        box = _receipt_box(np.asarray(image.convert("L")))
+        if box:
+            image = image.crop(box)
+        timings["crop"] = time.perf_counter() - start
+
+    if config.get("deskew"):
+        start = time.perf_counter()
+        angle = _estimate_skew(np.asarray(image.convert("L")), config.get("deskew_max_angle", 10.0))
+        if angle:
+            fill = 255 if image.mode == "L" else (255, 255, 255)
+            image = image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=fill)
+        timings["deskew"] = time.perf_counter() - start
+
+    return np.asarray(image), timings
+
+
+# Currency amounts in various locales, compiled once at import
+AMOUNT_PATTERNS: List[re.Pattern] = [re.compile(p, re.IGNORECASE) for p in (
+    # e.g., Rs 1,234.56 or LKR 1,234.56 or $1,234.56 or €1.234,56
+    r"(?:\b(?:rs\.?|lkr|usd|eur|gbp|inr|aed|sar)\b)?\s*[\$₹£€]?[\s]*([0-9]{1,3}(?:[ ,][0-9]{3})*(?:[\.,][0-9]{2})|[0-9]+(?:[\.,][0-9]{2}))",
+    # plain number with decimals
+    r"\b([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})|[0-9]+\.[0-9]{2})\b",
+    # some locales use comma decimal
+    r"\b([0-9]{1,3}(?:\.[0-9]{3})*(?:,[0-9]{2}))\b",
+)]
 
 
 NEG_TOTAL_HINTS = {
@@ -41,6 +273,67 @@ POS_TOTAL_HINTS = {
     "bill total",
 }
 
+RECEIPT_TYPE_KEYWORDS: Dict[str, List[str]] = {
+    "grocery": ["supermarket", "grocery", "mart", "fresh", "organic", "vegetables", "fruits"],
+    "restaurant": ["restaurant", "cafe", "coffee", "dining", "food", "bistro", "diner", "pizza", "burger"],
+    "fuel": ["gas", "petrol", "fuel", "diesel", "oil", "gallons", "liters", "pump"],
+    "utilities": ["electricity", "water", "gas bill", "utility", "kwh", "consumption"],
+    "pharmacy": ["pharmacy", "medical", "rx", "prescription", "medicine", "health"],
+    "transportation": ["taxi", "uber", "lyft", "transport", "ride", "fare", "metro", "bus"],
+    "shopping": ["store", "shop", "retail", "mall", "purchase", "sale"],
+    "online": ["amazon", "ebay", "online", "order", "delivery", "shipping"],
+}
+
+
+def _trie_pattern(words) -> str:
+    """Regex source for a keyword trie, e.g. {"total", "total due"} -> "total(?:\\ due)?".
+
+    Unlike a flat alternation the regex engine walks it like an automaton, and the
+    greedy optional tails make it match the longest keyword at each position.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # end of a keyword
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+# All total hints in one automaton: group 1 = negative hint, group 2 = positive hint
+_TOTAL_HINT_RE = re.compile(r"(%s)|(%s)" % (_trie_pattern(NEG_TOTAL_HINTS), _trie_pattern(POS_TOTAL_HINTS)))
+
+# Every receipt-type keyword in one regex. A match implies all keywords it contains
+# ("gas bill" contains "gas"), so each keyword maps to the types of its substrings too.
+_ALL_TYPE_KEYWORDS = {kw for kws in RECEIPT_TYPE_KEYWORDS.values() for kw in kws}
+_TYPE_KEYWORD_RE = re.compile(_trie_pattern(_ALL_TYPE_KEYWORDS))
+_KEYWORD_TYPES: Dict[str, set] = {
+    kw: {t for t, kws in RECEIPT_TYPE_KEYWORDS.items() if any(k in kw for k in kws)}
+    for kw in _ALL_TYPE_KEYWORDS
+}
+
+# Lines mentioning payment/tax details are skipped by the global-max total fallback
+_NON_TOTAL_LINE_RE = re.compile(r"\b(visa|mastercard|amex|card|auth|approval|invoice|gst|vat|tax|tel|phone)\b", re.IGNORECASE)
+
+# Date formats in priority order: YYYY-MM-DD, DD-MM-YYYY (or MM-DD-YYYY), 15 Jan 2025
+# (case-insensitive only around the month name, which keeps the digit scanning fast)
+_DATE_RE = re.compile(
+    r"(?<!\w)(?:(\d{4}[-/]\d{2}[-/]\d{2})\b|(\d{2}[-/]\d{2}[-/]\d{4})\b"
+    r"|(\d{1,2}\s+(?i:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-zA-Z]*\s+\d{4})\b)"
+)
+
+_DIGIT_RE = re.compile(r"\d")
+
+_VENDOR_NOISE_RE = re.compile(r'[^A-Z\s]')
+
 
 def _normalize_amount_str(s: str) -> float:
     """Convert an extracted amount string into a float, handling ,/. separators."""
@@ -103,194 +396,229 @@ def _group_into_lines(detailed: List[Tuple[List[Tuple[int, int]], str, float]])
     return lines
 
 
-def _extract_total_from_lines(lines: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Heuristically extract the grand total from OCR lines."""
-    amt_patterns = _amount_regexps()
-
-    def line_has_pos_total(line_text: str) -> bool:
-        lt = line_text.lower()
-        if any(h in lt for h in NEG_TOTAL_HINTS):
-            return False
-        return any(h in lt for h in POS_TOTAL_HINTS)
-
-    candidates = []
-    for idx, line in enumerate(lines):
-        text = line["text"]
-        if line_has_pos_total(text):
-            # Extract last amount on the line
-            found_amount = None
-            for pat in amt_patterns:
-                matches = list(pat.finditer(text))
-                if matches:
-                    found_amount = matches[-1].group(1)
-            if found_amount:
-                val = _normalize_amount_str(found_amount)
-                candidates.append({
-                    "index": idx,
-                    "y": line["y"],
-                    "text": text,
-                    "amount_text": found_amount,
-                    "amount": val,
-                })
-
-    # Prefer the candidate nearest to the bottom of the receipt
-    if candidates:
-        candidates.sort(key=lambda c: (c["y"], c["amount"]))
-        best = candidates[-1]
-        return {
-            "amount": best["amount"],
-            "amount_text": best["amount_text"],
-            "line_index": best["index"],
-            "line_text": best["text"],
-            "strategy": "keyword_bottommost",
-        }
+def _overlapping(pattern: re.Pattern, text: str):
+    """Yield matches starting at every position, so "grand total items" still finds "total items"."""
+    m = pattern.search(text)
+    while m:
+        yield m
+        m = pattern.search(text, m.start() + 1)
+
+
+def _line_amounts(text: str) -> List[List[re.Match]]:
+    if not _DIGIT_RE.search(text):
+        return [[] for _ in AMOUNT_PATTERNS]
+    return [list(pat.finditer(text)) for pat in AMOUNT_PATTERNS]
+
+
+def _scan_lines(lines: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Collect total, date, vendor and receipt-type candidates in one pass over the receipt.
+
+    Lines are joined once and each precompiled regex scans the whole text a single
+    time; match offsets are mapped back to their line with a bisect.
+    """
+    texts = [line["text"] for line in lines]
+    text = "\n".join(texts)
+    # Keyword regexes run on lower-cased text (much faster than re.IGNORECASE)
+    lowered_texts = [t.lower() for t in texts]
+    lowered = "\n".join(lowered_texts)
+    starts = list(accumulate((len(t) + 1 for t in lowered_texts[:-1]), initial=0))
+
+    def line_of(pos: int) -> int:
+        return bisect_right(starts, pos) - 1
 
-    # Fallback: choose the maximum plausible amount across all lines
-    max_amt = 0.0
+    # Total hints: a negative hint anywhere on a line disqualifies it
+    pos_lines: set = set()
+    neg_lines: set = set()
+    for m in _overlapping(_TOTAL_HINT_RE, lowered):
+        (neg_lines if m.group(1) else pos_lines).add(line_of(m.start()))
+
+    total_candidates = []
+    for idx in sorted(pos_lines - neg_lines):
+        # Extract the last amount on the line (the last pattern that matches wins)
+        found_amount = None
+        for matches in _line_amounts(texts[idx]):
+            if matches:
+                found_amount = matches[-1].group(1)
+        if found_amount:
+            total_candidates.append({
+                "index": idx,
+                "y": lines[idx]["y"],
+                "text": texts[idx],
+                "amount_text": found_amount,
+                "amount": _normalize_amount_str(found_amount),
+            })
+
+    # Fallback: the maximum plausible amount, only needed when no keyword line was found
+    max_amount = 0.0
     max_info = None
-    for idx, line in enumerate(lines):
-        text = line["text"]
-        # Skip obvious non-amount lines
-        if re.search(r"\b(visa|mastercard|amex|card|auth|approval|invoice|gst|vat|tax|tel|phone)\b", text, re.I):
-            continue
-        for pat in amt_patterns:
-            for m in pat.finditer(text):
-                val = _normalize_amount_str(m.group(1))
-                # Heuristic: ignore very small or very large unrealistic numbers
-                if 0.05 <= val <= 1000000:
-                    if val >= max_amt:
-                        max_amt = val
+    if not total_candidates:
+        for idx, line_text in enumerate(texts):
+            # Skip obvious non-amount lines
+            if _NON_TOTAL_LINE_RE.search(line_text):
+                continue
+            for matches in _line_amounts(line_text):
+                for m in matches:
+                    val = _normalize_amount_str(m.group(1))
+                    # Heuristic: ignore very small or very large unrealistic numbers
+                    if 0.05 <= val <= 1000000 and val >= max_amount:
+                        max_amount = val
                         max_info = {
                             "amount": val,
                             "amount_text": m.group(1),
                             "line_index": idx,
-                            "line_text": text,
+                            "line_text": line_text,
                             "strategy": "global_max",
                         }
-    return max_info or {}
-
-
-def _detect_receipt_type(text: str, lines: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Detect the type of receipt/bill based on keywords."""
-    text_lower = text.lower()
-    
-    # Define keywords for different bill types
-    receipt_patterns = {
-        "grocery": ["supermarket", "grocery", "mart", "fresh", "organic", "vegetables", "fruits"],
-        "restaurant": ["restaurant", "cafe", "coffee", "dining", "food", "bistro", "diner", "pizza", "burger"],
-        "fuel": ["gas", "petrol", "fuel", "diesel", "oil", "gallons", "liters", "pump"],
-        "utilities": ["electricity", "water", "gas bill", "utility", "kwh", "consumption"],
-        "pharmacy": ["pharmacy", "medical", "rx", "prescription", "medicine", "health"],
-        "transportation": ["taxi", "uber", "lyft", "transport", "ride", "fare", "metro", "bus"],
-        "shopping": ["store", "shop", "retail", "mall", "purchase", "sale"],
-        "online": ["amazon", "ebay", "online", "order", "delivery", "shipping"],
+
+    # Date: first match of each format; stop once the preferred format is found
+    dates: List[Optional[str]] = [None, None, None]
+    for m in _overlapping(_DATE_RE, text):
+        for i, value in enumerate(m.groups()):
+            if value and dates[i] is None:
+                dates[i] = value
+        if dates[0]:
+            break
+
+    types: set = set()
+    for m in _overlapping(_TYPE_KEYWORD_RE, lowered):
+        types |= _KEYWORD_TYPES[m.group(0)]
+
+    # Vendor: first ALL CAPS line (longer than 3 chars) among the first three lines,
+    # else the first word of the first non-trivial line
+    vendor = ""
+    for line_text in texts[:3]:
+        stripped = line_text.strip()
+        if stripped.isupper() and len(stripped) > 3:
+            clean = _VENDOR_NOISE_RE.sub('', stripped).strip()
+            if len(clean) >= 3:
+                vendor = clean
+                break
+    if not vendor:
+        vendor = next((t.strip().split()[0] for t in texts[:3] if len(t.strip()) > 2), "")
+
+    return {
+        "total_candidates": total_candidates,
+        "total_fallback": max_info,
+        "dates": dates,
+        "types": types,
+        "vendor": vendor,
     }
-    
-    detected = []
-    for bill_type, keywords in receipt_patterns.items():
-        if any(kw in text_lower for kw in keywords):
-            detected.append(bill_type)
-    
+
+
+def _pick_total(scan: Dict[str, Any]) -> Dict[str, Any]:
+    """Prefer the keyword candidate nearest to the bottom, else the global maximum."""
+    candidates = scan["total_candidates"]
+    if candidates:
+        best = max(candidates, key=lambda c: (c["y"], c["amount"], c["index"]))
+        return {
+            "amount": best["amount"],
+            "amount_text": best["amount_text"],
+            "line_index": best["index"],
+            "line_text": best["text"],
+            "strategy": "keyword_bottommost",
+        }
+    return scan["total_fallback"] or {}
+
+
+def _pick_receipt_type(scan: Dict[str, Any]) -> Dict[str, Any]:
+    detected = [t for t in RECEIPT_TYPE_KEYWORDS if t in scan["types"]]
     if not detected:
         detected.append("general")
-    
     return {
         "type": detected[0] if len(detected) == 1 else "mixed",
         "all_types": detected,
-        "confidence": "high" if len(detected) == 1 else "medium" if detected else "low"
+        "confidence": "high" if len(detected) == 1 else "medium"
     }
 
 
-def _extract_vendor(text: str, lines: List[Dict[str, Any]]) -> str:
-    """Extract vendor/merchant name (typically first few lines, all caps)."""
-    if not lines:
-        return ""
-    
-    # Look at first 3 lines for all-caps vendor names
-    for i in range(min(3, len(lines))):
-        line_text = lines[i]["text"].strip()
-        # Vendor names often ALL CAPS and longer than 3 chars
-        if line_text.isupper() and len(line_text) > 3:
-            # Remove common noise
-            clean = re.sub(r'[^A-Z\s]', '', line_text).strip()
-            if len(clean) >= 3:
-                return clean
-    
-    # Fallback: take first non-empty line
-    for line in lines[:3]:
-        text = line["text"].strip()
-        if len(text) > 2:
-            return text.split()[0]  # First word
-    
-    return ""
-
-
-def _extract_date(text: str) -> str:
-    """Extract date from receipt."""
-    # Common date patterns
-    patterns = [
-        r'\b(\d{4}[-/]\d{2}[-/]\d{2})\b',  # YYYY-MM-DD
-        r'\b(\d{2}[-/]\d{2}[-/]\d{4})\b',  # DD-MM-YYYY or MM-DD-YYYY
-        r'\b(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{4})\b',  # 15 Jan 2025
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            return match.group(1)
-    
-    return ""
-
-
-def extract_text_and_fields(image_path: str) -> Dict[str, Any]:
-    """Run EasyOCR and return both raw text and parsed fields (like total, vendor, type)."""
-    reader = easyocr.Reader(['en'])
-    detailed = reader.readtext(image_path, detail=1)  # [(bbox, text, conf), ...]
+def _pick_date(scan: Dict[str, Any]) -> str:
+    return next((d for d in scan["dates"] if d), "")
+
+
+# Receipt parser pipeline. Each stage reads and extends a shared context dict
+# ({"image_path", "preprocess", "detailed", "text", "lines", "scan", "fields", "timings"})
+# and is timed individually. Use register_stage() to add or replace stages.
+def _stage_detect(ctx: Dict[str, Any]) -> None:
+    preprocess = ctx["preprocess"]
+    image: Any = ctx["image_path"]
+    if preprocess.get("enabled"):
+        image, stage_timings = preprocess_image(ctx["image_path"], preprocess)
+        ctx["timings"].update({f"preprocess.{k}": v for k, v in stage_timings.items()})
+    with get_reader_pool().reader() as reader:
+        ctx["detailed"] = reader.readtext(image, detail=1)  # [(bbox, text, conf), ...]
     # Build plain text (joined by newlines to preserve some structure)
-    plain_text = "\n".join([t for (_, t, _) in detailed])
-    lines = _group_into_lines(detailed)
-    total = _extract_total_from_lines(lines)
-    receipt_type = _detect_receipt_type(plain_text, lines)
-    vendor = _extract_vendor(plain_text, lines)
-    date = _extract_date(plain_text)
-    
-    return {
-        "text": plain_text,
-        "lines": lines,
-        "fields": {
-            "total": total,
-            "receipt_type": receipt_type,
-            "vendor": vendor,
-            "date": date,
-        },
-    }
+    ctx["text"] = "\n".join([t for (_, t, _) in ctx["detailed"]])
 
 
-def extract_text_from_image(image_path):
-    """
-    Backward-compatible helper that returns only the flattened text.
-    """
-    try:
-        data = extract_text_and_fields(image_path)
-        return data.get("text", "")
-    except Exception as e:
-        return f"Error: {str(e)}"
+def _stage_group_lines(ctx: Dict[str, Any]) -> None:
+    ctx["lines"] = _group_into_lines(ctx["detailed"])
 
 
-def extract_text_and_fields(image_path: str) -> Dict[str, Any]:
-    """Run EasyOCR and return both raw text and parsed fields (like total)."""
-    reader = easyocr.Reader(['en'])
-    detailed = reader.readtext(image_path, detail=1)  # [(bbox, text, conf), ...]
-    # Build plain text (joined by newlines to preserve some structure)
-    plain_text = "\n".join([t for (_, t, _) in detailed])
-    lines = _group_into_lines(detailed)
-    total = _extract_total_from_lines(lines)
+def _stage_scan(ctx: Dict[str, Any]) -> None:
+    ctx["scan"] = _scan_lines(ctx["lines"])
+
+
+def _stage_total(ctx: Dict[str, Any]) -> None:
+    ctx["fields"]["total"] = _pick_total(ctx["scan"])
+
+
+def _stage_vendor(ctx: Dict[str, Any]) -> None:
+    ctx["fields"]["vendor"] = ctx["scan"]["vendor"]
+
+
+def _stage_date(ctx: Dict[str, Any]) -> None:
+    ctx["fields"]["date"] = _pick_date(ctx["scan"])
+
+
+def _stage_type(ctx: Dict[str, Any]) -> None:
+    ctx["fields"]["receipt_type"] = _pick_receipt_type(ctx["scan"])
+
+
+OCR_PIPELINE: List[Tuple[str, Callable[[Dict[str, Any]], None]]] = [
+    ("detect", _stage_detect),
+    ("group_lines", _stage_group_lines),
+    ("scan", _stage_scan),
+    ("total", _stage_total),
+    ("vendor", _stage_vendor),
+    ("date", _stage_date),
+    ("type", _stage_type),
+]
+
+
+def register_stage(name: str, func: Callable[[Dict[str, Any]], None], after: Optional[str] = None) -> None:
+    """Replace the stage called `name`, or insert it (after `after`, else at the end)."""
+    names = [n for n, _ in OCR_PIPELINE]
+    if name in names:
+        OCR_PIPELINE[names.index(name)] = (name, func)
+    elif after is not None:
+        OCR_PIPELINE.insert(names.index(after) + 1, (name, func))
+    else:
+        OCR_PIPELINE.append((name, func))
+
+
+def run_pipeline(image_path: str, preprocess: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run every pipeline stage in order and return the final context."""
+    ctx: Dict[str, Any] = {
+        "image_path": image_path,
+        "preprocess": PREPROCESS_DEFAULTS if preprocess is None else preprocess,
+        "fields": {},
+        "timings": {},
+    }
+    for name, stage in OCR_PIPELINE:
+        start = time.perf_counter()
+        stage(ctx)
+        ctx["timings"][name] = time.perf_counter() - start
+    return ctx
+
+
+def extract_text_and_fields(image_path: str, preprocess: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run EasyOCR and return raw text, grouped lines and parsed fields (total, vendor, date, type)."""
+    ctx = run_pipeline(image_path, preprocess)
     return {
-        "text": plain_text,
-        "lines": lines,
-        "fields": {
-            "total": total,
-        },
+        "text": ctx["text"],
+        "lines": ctx["lines"],
+        "fields": ctx["fields"],
+        "timings": ctx["timings"],
     }
 
 
@@ -302,4 +630,4 @@ def extract_text_from_image(image_path):
         data = extract_text_and_fields(image_path)
         return data.get("text", "")
     except Exception as e:
-        return f"Error: {str(e)}"
\ No newline at end of file
+        return f"Error: {str(e)}"
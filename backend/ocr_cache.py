@@ -0,0 +1,102 @@
+"""
+Content-addressed receipt storage and OCR result cache.
+
+Uploads are stored as `uploads/<sha256><ext>`, so re-uploading the same image
+neither rewrites the file nor reruns OCR: the `ocr_cache` table keeps the
+extraction result per hash, evicting least recently used entries beyond
+`OCR_CACHE_MAX_ENTRIES`. Entries written by another parser version (or
+preprocessing config, see `ocr_result_version`) are treated as misses and
+purged on startup.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+from werkzeug.utils import secure_filename
+
+from models import db, OcrCacheEntry
+from ocr import ocr_result_version
+
+OCR_CACHE_MAX_ENTRIES = int(os.environ.get('OCR_CACHE_MAX_ENTRIES', '5000'))
+CHUNK_SIZE = 1024 * 1024
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _count(key, n=1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+def store_upload(file, folder):
+    """Save an uploaded file under its SHA-256 and return (content_hash, filepath)."""
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+    content_hash = digest.hexdigest()
+    ext = os.path.splitext(secure_filename(file.filename))[1].lower()
+    filepath = os.path.join(folder, content_hash + ext)
+    if os.path.exists(filepath):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, filepath)
+    return content_hash, filepath
+
+
+def get_cached(content_hash):
+    """Return the cached OCR payload for this image, or None."""
+    entry = db.session.get(OcrCacheEntry, content_hash)
+    if entry is None or entry.parser_version != ocr_result_version():
+        _count("misses")
+        return None
+    entry.hits += 1
+    entry.last_used_at = datetime.utcnow()
+    db.session.commit()
+    _count("hits")
+    return json.loads(entry.result)
+
+
+def put_cached(content_hash, payload):
+    """Cache an OCR payload, evicting the least recently used entries over the cap."""
+    entry = db.session.get(OcrCacheEntry, content_hash)
+    if entry is None:
+        entry = OcrCacheEntry(content_hash=content_hash)
+        db.session.add(entry)
+    entry.parser_version = ocr_result_version()
+    entry.result = json.dumps(payload)
+    entry.last_used_at = datetime.utcnow()
+    db.session.flush()
+
+    overflow = OcrCacheEntry.query.count() - OCR_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        stale = db.session.query(OcrCacheEntry.content_hash).order_by(OcrCacheEntry.last_used_at).limit(overflow)
+        OcrCacheEntry.query.filter(OcrCacheEntry.content_hash.in_(stale.scalar_subquery())).delete(synchronize_session=False)
+        _count("evictions", overflow)
+    db.session.commit()
+
+
+def purge_stale():
+    """Drop entries produced by a different parser version."""
+    OcrCacheEntry.query.filter(OcrCacheEntry.parser_version != ocr_result_version()).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["entries"] = OcrCacheEntry.query.count()
+    stats["max_entries"] = OCR_CACHE_MAX_ENTRIES
+    stats["parser_version"] = ocr_result_version()
+    return stats
@@ -0,0 +1,357 @@
+"""
+Background OCR job queue.
+
+Uploads are recorded in the `ocr_jobs` table and processed by a local process
+pool, so the request thread returns a job id immediately. Images already in
+the OCR cache complete immediately without touching the pool.
+
+A job is `running` while a server process owns it (`claimed_by`). Each process
+refreshes `heartbeat_at` on its jobs every OCR_JOB_HEARTBEAT seconds from a
+maintenance thread, which also shuts down pools idle for OCR_POOL_IDLE_TIMEOUT
+seconds and claims `queued` jobs and jobs whose owner has
+been silent for OCR_JOB_STALE_AFTER seconds (a worker that died or a server
+that stopped). Claims are conditional UPDATEs, so exactly one process takes
+over each job, and jobs a live sibling is still running are never repeated.
+
+Batch uploads use a second pool, sized to this process's share of the cores
+(CPU count / GUNICORN_WORKERS), and stream results back as each file finishes.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from functools import partial
+
+from sqlalchemy import and_, or_
+
+from models import db, OcrJob
+from ocr_cache import get_cached, purge_stale, put_cached
+from ocr import extract_text_and_fields, reader_pool_stats, warm_up_readers
+
+# Number of OCR worker processes (each loads its own EasyOCR reader)
+OCR_JOB_WORKERS = int(os.environ.get('OCR_JOB_WORKERS', '2'))
+# Batch OCR spreads files over the cores; every gunicorn worker has its own
+# pool, so by default each gets an equal share instead of one process per core
+_SERVER_WORKERS = max(1, int(os.environ.get('GUNICORN_WORKERS', '1')))
+OCR_BATCH_WORKERS = int(os.environ.get('OCR_BATCH_WORKERS', str(max(1, (os.cpu_count() or 1) // _SERVER_WORKERS))))
+# Seconds an OCR pool may sit idle before its processes (and their models) are released; 0 keeps them
+OCR_POOL_IDLE_TIMEOUT = float(os.environ.get('OCR_POOL_IDLE_TIMEOUT', '300'))
+
+# Seconds between heartbeats of this process's running jobs
+OCR_JOB_HEARTBEAT = float(os.environ.get('OCR_JOB_HEARTBEAT', '15'))
+# Seconds without a heartbeat after which another process takes a running job over
+OCR_JOB_STALE_AFTER = float(os.environ.get('OCR_JOB_STALE_AFTER', '120'))
+
+logger = logging.getLogger(__name__)
+
+_app = None
+_executors = {}
+_executor_lock = threading.Lock()
+# Per pool name: [futures in flight, monotonic time of the last submit or completion]
+_pool_activity = {}
+# Latest reader pool stats reported by each worker process, keyed by pid
+_worker_stats = {}
+
+
+def run_ocr(filepath):
+    """Worker entry point: OCR + field extraction, shaped like the /upload response."""
+    ocr_data = extract_text_and_fields(filepath)
+    payload = {
+        "extracted_text": ocr_data.get("text"),
+        "text": ocr_data.get("text"),
+        "fields": ocr_data.get("fields", {}),
+        "lines": ocr_data.get("lines", []),
+        "timings": ocr_data.get("timings", {}),
+    }
+    return payload, os.getpid(), reader_pool_stats()
+
+
+def _start_worker():
+    warm_up_readers()
+    return os.getpid(), reader_pool_stats()
+
+
+def _init_batch_worker():
+    # One OCR process per core: stop torch from also spreading each process over every core
+    import torch
+    torch.set_num_threads(1)
+
+
+def _new_owner():
+    # Unique per process lifetime, so a reused pid never adopts a dead process's claims
+    return f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+_owner = _new_owner()
+_maintenance = None
+_maintenance_lock = threading.Lock()
+_warmed = False
+
+
+def _reset_after_fork():
+    # A forked child (gunicorn preload) inherits executor objects whose management
+    # threads only exist in the parent; start over with its own pools, identity
+    # and maintenance thread
+    global _executor_lock, _owner, _maintenance, _maintenance_lock, _warmed
+    _executors.clear()
+    _pool_activity.clear()
+    _worker_stats.clear()
+    _executor_lock = threading.Lock()
+    _owner = _new_owner()
+    _maintenance = None
+    _maintenance_lock = threading.Lock()
+    _warmed = False
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_executor(name='jobs'):
+    with _executor_lock:
+        if name not in _executors:
+            if name == 'batch':
+                max_workers, initializer = OCR_BATCH_WORKERS, _init_batch_worker
+            else:
+                max_workers, initializer = OCR_JOB_WORKERS, None
+            # spawn: forking a threaded server process (and torch) is unsafe
+            _executors[name] = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=initializer,
+            )
+        return _executors[name]
+
+
+def _submit(name, fn, *args):
+    """Submit to the named pool, tracking activity for the idle shutdown."""
+    with _executor_lock:
+        activity = _pool_activity.setdefault(name, [0, time.monotonic()])
+        activity[0] += 1
+        activity[1] = time.monotonic()
+    future = _get_executor(name).submit(fn, *args)
+
+    def done(_):
+        with _executor_lock:
+            activity[0] -= 1
+            activity[1] = time.monotonic()
+    future.add_done_callback(done)
+    return future
+
+
+def _shutdown_idle_pools():
+    """Shut down pools with nothing in flight for OCR_POOL_IDLE_TIMEOUT seconds."""
+    if OCR_POOL_IDLE_TIMEOUT <= 0:
+        return
+    idle = []
+    with _executor_lock:
+        for name, executor in list(_executors.items()):
+            if name == 'jobs' and _app is not None and _app.config.get('OCR_PRELOAD'):
+                continue  # kept warm on purpose
+            inflight, last_used = _pool_activity.get(name, (0, 0.0))
+            if inflight == 0 and time.monotonic() - last_used >= OCR_POOL_IDLE_TIMEOUT:
+                idle.append(_executors.pop(name))
+                _pool_activity.pop(name, None)
+    for executor in idle:
+        executor.shutdown(wait=False)
+
+
+def _reset_executor(name='jobs'):
+    with _executor_lock:
+        executor = _executors.pop(name, None)
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _finish(job_id, future):
+    """Store the worker result; runs on the executor's callback thread."""
+    with _app.app_context():
+        job = db.session.get(OcrJob, job_id)
+        if job is None or job.status in ('done', 'failed'):
+            return
+        try:
+            payload, pid, stats = future.result()
+            _worker_stats[pid] = stats
+            job.result = json.dumps(payload)
+            job.status = 'done'
+            db.session.commit()
+        except Exception as e:
+            # The session may need a rollback (e.g. a failed commit) before the job can be marked
+            db.session.rollback()
+            if isinstance(e, BrokenProcessPool):
+                _reset_executor()
+            _fail(job_id, str(e) or e.__class__.__name__)
+            return
+
+        # Caching is best effort: a clash with a concurrent upload of the same image
+        # must not fail (or strand) a job that already succeeded
+        if job.content_hash:
+            try:
+                put_cached(job.content_hash, payload)
+            except Exception:
+                db.session.rollback()
+                logger.warning("Could not cache OCR result for job %s", job_id, exc_info=True)
+
+
+def _fail(job_id, error):
+    try:
+        OcrJob.query.filter_by(id=job_id).update({'status': 'failed', 'error': error}, synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("Could not mark OCR job %s as failed", job_id)
+
+
+def _enqueue(job_id, filepath):
+    future = _submit('jobs', run_ocr, filepath)
+    future.add_done_callback(partial(_finish, job_id))
+
+
+def _claimable():
+    """Jobs nobody is running: queued, or claimed by a process that stopped heartbeating."""
+    cutoff = datetime.utcnow() - timedelta(seconds=OCR_JOB_STALE_AFTER)
+    return or_(
+        OcrJob.status == 'queued',
+        and_(OcrJob.status == 'running', or_(OcrJob.heartbeat_at < cutoff, OcrJob.heartbeat_at.is_(None))),
+    )
+
+
+def _heartbeat():
+    OcrJob.query.filter_by(claimed_by=_owner, status='running') \
+        .update({'heartbeat_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+
+
+def _claim_orphans():
+    """Take over claimable jobs one at a time and run them in this process."""
+    candidates = db.session.query(OcrJob.id, OcrJob.filepath).filter(_claimable()) \
+        .order_by(OcrJob.created_at).all()
+    for job_id, filepath in candidates:
+        claimed = OcrJob.query.filter(OcrJob.id == job_id, _claimable()).update(
+            {'status': 'running', 'claimed_by': _owner, 'heartbeat_at': datetime.utcnow()},
+            synchronize_session=False,
+        )
+        db.session.commit()
+        if claimed:
+            logger.info("Resuming OCR job %s", job_id)
+            _enqueue(job_id, filepath)
+
+
+def _maintain(app):
+    while True:
+        with app.app_context():
+            try:
+                _heartbeat()
+                _claim_orphans()
+                _shutdown_idle_pools()
+            except Exception:
+                logger.exception("OCR job maintenance failed")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+        time.sleep(OCR_JOB_HEARTBEAT)
+
+
+def ensure_maintenance():
+    """Start this process's heartbeat/recovery thread (once per process, after any fork)."""
+    global _maintenance
+    if _maintenance is not None or _app is None:
+        return
+    with _maintenance_lock:
+        if _maintenance is None:
+            warm_up_workers()
+            _maintenance = threading.Thread(target=_maintain, args=(_app,), name='ocr-job-maintenance', daemon=True)
+            _maintenance.start()
+
+
+def warm_up_workers():
+    """With OCR_PRELOAD, start this process's job pool so its models load before the first upload.
+
+    Called from gunicorn's post_fork and on the first request a process serves,
+    never while the app is built: a preloading gunicorn master would otherwise
+    spawn OCR processes that no worker can use.
+    """
+    global _warmed
+    if _warmed or _app is None or not _app.config.get('OCR_PRELOAD'):
+        return
+    _warmed = True
+    for _ in range(OCR_JOB_WORKERS):
+        _submit('jobs', _start_worker).add_done_callback(_record_worker_stats)
+
+
+def submit_job(filepath, content_hash=None):
+    """Record a job for the file and run it in this process, unless its result is already cached."""
+    cached = get_cached(content_hash) if content_hash else None
+    job = OcrJob(id=uuid.uuid4().hex, filepath=filepath, content_hash=content_hash)
+    if cached is None:
+        job.status = 'running'
+        job.claimed_by = _owner
+        job.heartbeat_at = datetime.utcnow()
+    else:
+        job.status = 'done'
+        job.result = json.dumps(cached)
+    db.session.add(job)
+    db.session.commit()
+    if cached is None:
+        _enqueue(job.id, filepath)
+    return job
+
+
+def get_job(job_id, refresh=False):
+    if refresh:
+        return db.session.get(OcrJob, job_id, populate_existing=True)
+    return db.session.get(OcrJob, job_id)
+
+
+def iter_batch_results(filepaths):
+    """Run OCR over many files on the batch pool, yielding results in completion order."""
+    futures = {_submit('batch', run_ocr, path): index for index, path in enumerate(filepaths)}
+    try:
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                payload, pid, stats = future.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    _reset_executor('batch')
+                yield {"index": index, "status": "failed", "error": str(e) or e.__class__.__name__}
+                continue
+            _worker_stats[pid] = stats
+            yield {"index": index, "status": "done", "result": payload}
+    finally:
+        # Client went away mid-stream: drop the files that haven't started yet
+        for future in futures:
+            future.cancel()
+
+
+def worker_reader_stats():
+    """Reader pool stats of the OCR worker processes, as last reported by each."""
+    return {str(pid): stats for pid, stats in _worker_stats.items()}
+
+
+def _record_worker_stats(future):
+    try:
+        pid, stats = future.result()
+    except Exception:
+        return
+    _worker_stats[pid] = stats
+
+
+def init_ocr_jobs(app):
+    """Bind the queue to the app; jobs left unfinished are resumed by the maintenance thread.
+
+    The thread (and, with OCR_PRELOAD, the warm OCR pool) starts with the first
+    request each process serves rather than here, so a gunicorn master that
+    builds the app before forking never claims or runs jobs or loads OCR models.
+    """
+    global _app
+    _app = app
+    with app.app_context():
+        purge_stale()
+    app.before_request(ensure_maintenance)
@@ -0,0 +1,64 @@
+"""
+Password hashing settings and bounded verification.
+
+PASSWORD_HASH_METHOD is any werkzeug method string ('scrypt',
+'scrypt:16384:8:1', 'pbkdf2:sha256:600000', ...). Hashes made with other
+parameters still verify and are upgraded on the next successful login.
+
+Verification runs on a small dedicated thread pool (hashlib releases the GIL
+while hashing), so the CPU spent on logins is capped independently of the
+request threads; when the pool and its queue are full, callers get
+VerifierBusy instead of piling up.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+# Concurrent verifications, and how many more may wait for a free thread
+PASSWORD_VERIFY_WORKERS = int(os.environ.get('PASSWORD_VERIFY_WORKERS', str(min(4, os.cpu_count() or 1))))
+PASSWORD_VERIFY_QUEUE = int(os.environ.get('PASSWORD_VERIFY_QUEUE', '32'))
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_VERIFY_WORKERS + PASSWORD_VERIFY_QUEUE)
+
+
+class VerifierBusy(Exception):
+    """All verification threads and queue slots are taken."""
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+
+@lru_cache(maxsize=None)
+def _method_prefix(method):
+    # werkzeug fills in default parameters ('scrypt' -> 'scrypt:32768:8:1'); hash once to learn them
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    """True if the hash was made with parameters other than PASSWORD_HASH_METHOD."""
+    return password_hash.split('$', 1)[0] != _method_prefix(PASSWORD_HASH_METHOD)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_VERIFY_WORKERS, thread_name_prefix='password-verify')
+        return _executor
+
+
+def verify_password(password_hash, password):
+    """Check a password on the verification pool; raises VerifierBusy when saturated."""
+    if not _slots.acquire(blocking=False):
+        raise VerifierBusy()
+    try:
+        return _get_executor().submit(check_password_hash, password_hash, password).result()
+    finally:
+        _slots.release()
@@ -0,0 +1,176 @@
+"""
+Re-run OCR field extraction over every receipt in an uploads directory.
+
+Usage:
+    python reextract.py [uploads/] -o results.jsonl [--workers 4]
+    python reextract.py [uploads/] -o results.db
+
+Results go to a JSONL file or, for a .db/.sqlite output, an `extractions`
+table. The output doubles as the checkpoint: files already recorded for the
+current parser version are skipped, so an interrupted run resumes where it
+stopped. Throughput (receipts/sec) and average per-stage time are reported
+as the run progresses.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+
+from ocr import extract_text_and_fields, ocr_result_version
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp'}
+REPORT_EVERY = 50
+
+
+def _init_worker():
+    # One OCR process per core: stop torch from also spreading each process over every core
+    import torch
+    torch.set_num_threads(1)
+
+
+def process_file(path):
+    """Worker: extract one receipt, never raising so one bad file can't stop the run."""
+    start = time.perf_counter()
+    try:
+        data = extract_text_and_fields(path)
+        record = {"path": path, "text": data["text"], "fields": data["fields"], "timings": data["timings"], "error": None}
+    except Exception as e:
+        record = {"path": path, "text": None, "fields": None, "timings": {}, "error": str(e) or e.__class__.__name__}
+    record["elapsed"] = time.perf_counter() - start
+    return record
+
+
+def find_images(folder):
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                yield os.path.join(root, name)
+
+
+class JsonlSink:
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+
+    def done_paths(self):
+        done = set()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # partial last line from an interrupted run
+                    if record.get("parser_version") == self.version and not record.get("error"):
+                        done.add(record["path"])
+        return done
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        return self
+
+    def write(self, record):
+        self.file.write(json.dumps(dict(record, parser_version=self.version)) + "\n")
+        self.file.flush()
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+
+class SqliteSink:
+    COMMIT_EVERY = 50
+
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            " path TEXT PRIMARY KEY, parser_version TEXT NOT NULL, text TEXT, fields TEXT,"
+            " timings TEXT, error TEXT, elapsed REAL, extracted_at TEXT DEFAULT CURRENT_TIMESTAMP)"
+        )
+        self.pending = 0
+
+    def done_paths(self):
+        rows = self.conn.execute(
+            "SELECT path FROM extractions WHERE parser_version = ? AND error IS NULL", (self.version,)
+        )
+        return {path for (path,) in rows}
+
+    def __enter__(self):
+        return self
+
+    def write(self, record):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO extractions (path, parser_version, text, fields, timings, error, elapsed)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (record["path"], self.version, record["text"], json.dumps(record["fields"]),
+             json.dumps(record["timings"]), record["error"], record["elapsed"]),
+        )
+        self.pending += 1
+        if self.pending >= self.COMMIT_EVERY:
+            self.conn.commit()
+            self.pending = 0
+
+    def __exit__(self, *exc):
+        self.conn.commit()
+        self.conn.close()
+
+
+def report(done, failed, total, started, stage_time):
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed else 0.0
+    stages = ", ".join(f"{stage} {seconds / max(done - failed, 1) * 1000:.0f}ms" for stage, seconds in sorted(stage_time.items()))
+    print(f"  {done}/{total} receipts, {failed} failed, {rate:.2f} receipts/sec | {stages}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('folder', nargs='?', default='uploads', help='Uploads directory to walk')
+    parser.add_argument('-o', '--output', required=True, help='Output .jsonl file or .db/.sqlite database')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--force', action='store_true', help='Reprocess files already in the output')
+    args = parser.parse_args()
+
+    version = ocr_result_version()
+    is_sqlite = os.path.splitext(args.output)[1].lower() in ('.db', '.sqlite', '.sqlite3')
+    sink = (SqliteSink if is_sqlite else JsonlSink)(args.output, version)
+
+    files = list(find_images(args.folder))
+    skip = set() if args.force else sink.done_paths()
+    todo = [f for f in files if f not in skip]
+    print(f"🔍 {len(files)} receipts found, {len(files) - len(todo)} already extracted (parser {version}), {len(todo)} to go")
+    if not todo:
+        return
+
+    stage_time = defaultdict(float)
+    done = failed = 0
+    started = time.perf_counter()
+    ctx = multiprocessing.get_context('spawn')
+    with sink, ctx.Pool(args.workers, initializer=_init_worker) as pool:
+        try:
+            for record in pool.imap_unordered(process_file, todo):
+                sink.write(record)
+                done += 1
+                if record["error"]:
+                    failed += 1
+                for stage, seconds in record["timings"].items():
+                    stage_time[stage] += seconds
+                if done % REPORT_EVERY == 0:
+                    report(done, failed, len(todo), started, stage_time)
+        except KeyboardInterrupt:
+            pool.terminate()
+            print("\n⏸️  Interrupted; rerun the same command to resume.")
+            report(done, failed, len(todo), started, stage_time)
+            sys.exit(130)
+
+    print("✅ Done")
+    report(done, failed, len(todo), started, stage_time)
+
+
+if __name__ == '__main__':
+    main()
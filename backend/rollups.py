@@ -0,0 +1,135 @@
+"""
+Monthly rollups - per-user spend per (month, category), kept in step with expenses.
+
+Rows are keyed on the case-insensitive category_key, like budgets and the
+category filter, so 'food' and 'Food' add up to one category. `label` keeps a
+spelling to display.
+
+Every write to `expenses` goes through `apply_expense` in the same transaction, so
+aggregate reads touch one row per month and category instead of every expense.
+`flask rollups verify` / `flask rollups rebuild` reconcile the table with the raw rows.
+"""
+import click
+from sqlalchemy import and_, case, or_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Expense, MonthlyRollup, expense_keys
+
+
+def rollup_key(expense):
+    keys = expense_keys(expense.date, expense.category, expense.created_at)
+    return expense.user_id, keys['month'], keys['category_key']
+
+
+def _insert(table):
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def add_to_rollup(user_id, month, category_key, total, count, label=None):
+    """Atomically add total/count to one rollup row, creating or dropping it as needed."""
+    table = MonthlyRollup.__table__
+    stmt = _insert(table).values(user_id=user_id, month=month, category=category_key, label=label,
+                                 total=total, count=count)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.month, table.c.category],
+        set_={
+            'total': table.c.total + stmt.excluded.total,
+            'count': table.c.count + stmt.excluded.count,
+            # Same choice as func.min() over the spellings in analytics_routes
+            'label': case((or_(table.c.label.is_(None), stmt.excluded.label < table.c.label), stmt.excluded.label),
+                          else_=table.c.label),
+        }
+    )
+    db.session.execute(stmt)
+    if count < 0:
+        db.session.execute(table.delete().where(and_(
+            table.c.user_id == user_id, table.c.month == month,
+            table.c.category == category_key, table.c.count <= 0
+        )))
+
+
+def apply_expense(expense, sign=1):
+    """Count an expense into (sign=1) or out of (sign=-1) its rollup row."""
+    add_to_rollup(*rollup_key(expense), sign * (expense.amount or 0.0), sign, label=expense.category or '')
+
+
+def compute_rollups(user_id=None):
+    """Aggregate rollups from the raw expenses: {(user_id, month, category_key): [total, count, label]}."""
+    query = Expense.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    totals = {}
+    for expense in query.yield_per(1000):
+        label = expense.category or ''
+        entry = totals.setdefault(rollup_key(expense), [0.0, 0, label])
+        entry[0] += expense.amount or 0.0
+        entry[1] += 1
+        entry[2] = min(entry[2], label)
+    return totals
+
+
+def stored_rollups(user_id=None):
+    query = MonthlyRollup.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    return {(r.user_id, r.month, r.category): [r.total, r.count, r.label] for r in query}
+
+
+def diff_rollups(user_id=None):
+    """Rollup rows that disagree with the raw expenses: [(key, stored, expected)]."""
+    expected = compute_rollups(user_id)
+    stored = stored_rollups(user_id)
+    diffs = []
+    for key in sorted(set(expected) | set(stored)):
+        want, have = expected.get(key), stored.get(key)
+        if want is None or have is None or want[1] != have[1] or abs(want[0] - have[0]) > 0.005:
+            diffs.append((key, have, want))
+    return diffs
+
+
+def rebuild_rollups(user_id=None):
+    """Replace the stored rollups with ones recomputed from the raw expenses."""
+    expected = compute_rollups(user_id)
+    query = MonthlyRollup.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    query.delete(synchronize_session=False)
+    rows = [{'user_id': u, 'month': m, 'category': c, 'label': label, 'total': t, 'count': n}
+            for (u, m, c), (t, n, label) in expected.items()]
+    if rows:
+        db.session.execute(MonthlyRollup.__table__.insert(), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def ensure_rollups():
+    """Backfill the rollups once for databases created before the table existed."""
+    if MonthlyRollup.query.first() is None and Expense.query.first() is not None:
+        rebuild_rollups()
+
+
+def register_rollup_commands(app):
+    """Register `flask rollups rebuild|verify`"""
+
+    @app.cli.group('rollups')
+    def rollups_cli():
+        """Maintain the monthly spend rollups."""
+
+    @rollups_cli.command('verify')
+    @click.option('--user', 'user_id', type=int, help='Only check this user.')
+    def verify_command(user_id):
+        """Compare rollups against the raw expenses."""
+        diffs = diff_rollups(user_id)
+        for key, stored, expected in diffs:
+            click.echo(f"{key}: stored={stored} expected={expected}")
+        click.echo(f"{len(diffs)} mismatched rollup rows")
+        if diffs:
+            raise SystemExit(1)
+
+    @rollups_cli.command('rebuild')
+    @click.option('--user', 'user_id', type=int, help='Only rebuild this user.')
+    def rebuild_command(user_id):
+        """Recompute rollups from the raw expenses."""
+        click.echo(f"Rebuilt {rebuild_rollups(user_id)} rollup rows")
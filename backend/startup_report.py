@@ -0,0 +1,73 @@
+"""
+Report what app startup costs: per-module import time plus create_app().
+
+Usage:
+    python startup_report.py [--top 15] [--budget 1.5] [--preload]
+
+Runs a fresh interpreter with `python -X importtime`, so nothing already
+imported here skews the numbers. Import time is grouped by top-level package
+(self time, i.e. excluding the packages it imports). With --budget the script
+exits non-zero when import + create_app takes longer than that many seconds,
+which lets CI hold worker startup under a limit. --preload also loads the
+categorization model, as PRELOAD_MODELS=1 would.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+PROBE = '''
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print(json.dumps({"import": imported - start, "create_app": created - imported}))
+'''
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top', type=int, default=15, help='Packages to list')
+    parser.add_argument('--budget', type=float, help='Fail if import + create_app exceeds this many seconds')
+    parser.add_argument('--preload', action='store_true', help='Preload the ML model during create_app')
+    args = parser.parse_args()
+
+    env = dict(os.environ, PRELOAD_MODELS='1' if args.preload else os.environ.get('PRELOAD_MODELS', '0'))
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE], cwd=os.path.dirname(os.path.abspath(__file__)),
+                          env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.exit(proc.stderr)
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    by_package = defaultdict(int)
+    for name, self_us, _ in parse_importtime(proc.stderr):
+        by_package[name.split('.')[0]] += self_us
+
+    print(f"{'package':<28}{'ms':>10}")
+    for package, micros in sorted(by_package.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{package:<28}{micros / 1000:>10.1f}")
+    total = timings['import'] + timings['create_app']
+    print(f"\nimport app: {timings['import']:.2f}s  create_app(): {timings['create_app']:.2f}s  total: {total:.2f}s")
+
+    if args.budget is not None and total > args.budget:
+        print(f"❌ Startup {total:.2f}s exceeds budget of {args.budget:.2f}s")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+
+from compiled_model import CompiledCategorizer, export_compiled
+
+TRAIN = [
+    ('Supermarket groceries', 'Food'), ('Dinner at restaurant', 'Food'), ('Coffee shop', 'Food'),
+    ('Uber taxi ride', 'Transport'), ('Petrol station fuel', 'Transport'), ('Bus ticket', 'Transport'),
+    ('Electricity bill payment', 'Bills'), ('Water board charges', 'Bills'), ('Internet bill', 'Bills'),
+]
+# Enough distinct n-grams for ml_model.py's max_features=150 and max_df=0.8 to prune the vocabulary
+VENDORS = ['Keells', 'Cargills', 'Uber', 'PickMe', 'Dialog', 'Mobitel', 'Pharmacy', 'Cinema', 'Shell', 'Arpico']
+ITEMS = [('grocery shopping', 'Food'), ('lunch meal', 'Food'), ('taxi ride home', 'Transport'),
+         ('fuel top up', 'Transport'), ('monthly bill payment', 'Bills'), ('movie tickets', 'Entertainment')]
+CITIES = ['Colombo', 'Kandy', 'Galle']
+LARGE_TRAIN = [(f'{vendor} {item} {city}', label)
+               for vendor in VENDORS for item, label in ITEMS for city in CITIES]
+
+SAMPLES = [
+    'Electricity bill', 'UBER ride to the airport', 'groceries and fresh vegetables', 'coffee',
+    'Fuel', 'the and of', '', 'Restaurant dinner bill payment',
+]
+
+
+def _fit(train=TRAIN, **vectorizer_options):
+    options = dict(ngram_range=(1, 3), lowercase=True, stop_words='english')
+    options.update(vectorizer_options)
+    vectorizer = TfidfVectorizer(**options)
+    X = vectorizer.fit_transform([text for text, _ in train])
+    model = MultinomialNB(alpha=0.05).fit(X, [label for _, label in train])
+    return model, vectorizer
+
+
+def _assert_parity(tmp_path, model, vectorizer):
+    path = tmp_path / 'compiled.npz'
+    export_compiled(model, vectorizer, path)
+    compiled = CompiledCategorizer(path)
+    expected = model.predict_proba(vectorizer.transform(SAMPLES))
+    actual = compiled.predict_proba(compiled.transform(SAMPLES))
+    assert list(compiled.classes_) == list(model.classes_)
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-12)
+
+
+def test_compiled_model_matches_sklearn(tmp_path):
+    _assert_parity(tmp_path, *_fit())
+
+
+def test_compiled_model_matches_sublinear_unnormalized(tmp_path):
+    _assert_parity(tmp_path, *_fit(sublinear_tf=True, norm=None, stop_words=None))
+
+
+def test_compiled_model_matches_training_settings(tmp_path):
+    model, vectorizer = _fit(LARGE_TRAIN, max_features=150, min_df=1, max_df=0.8)
+    assert len(vectorizer.vocabulary_) == 150
+    _assert_parity(tmp_path, model, vectorizer)
+
+
+@pytest.mark.parametrize('options', [{'binary': True}, {'dtype': np.float32}, {'preprocessor': str.lower}])
+def test_export_rejects_unsupported_vectorizers(tmp_path, options):
+    with pytest.raises(ValueError):
+        export_compiled(*_fit(**options), tmp_path / 'compiled.npz')
@@ -0,0 +1,77 @@
+import io
+
+import pytest
+
+import import_routes
+from import_routes import parse_amount
+
+
+def test_parse_amount_formats():
+    assert parse_amount('1,250.50') == 1250.5
+    assert parse_amount('Rs. 99') == 99.0
+    assert parse_amount('LKR 1,500') == 1500.0
+    assert parse_amount('$1.234,56') == 1234.56
+    assert parse_amount('12,5') == 12.5
+    assert parse_amount('(20.00)') == -20.0
+    assert parse_amount('Rs. -99') == -99.0
+    assert parse_amount('-Rs. 99') == -99.0
+    assert parse_amount('99-') == -99.0
+    assert parse_amount('') is None
+    with pytest.raises(ValueError):
+        parse_amount('n/a')
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    # Statement rows without a category are categorized; keep the test independent of the trained model
+    monkeypatch.setattr(import_routes, 'categorize_many',
+                        lambda texts, top_k=1: [{'category': 'Other'} for _ in texts])
+    from app import create_app
+    app = create_app({'MIGRATE_ON_STARTUP': False})
+    client = app.test_client()
+    client.post('/register', json={'name': 'Test', 'email': 'import@example.com', 'password': 'secret'})
+    token = client.post('/login', json={'email': 'import@example.com', 'password': 'secret'}).json['token']
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    return client
+
+
+def _import(client, content, filename, **form):
+    data = {'file': (io.BytesIO(content.encode()), filename), **form}
+    return client.post('/import', data=data, content_type='multipart/form-data')
+
+
+def test_csv_import_keeps_repeats_and_skips_stored_duplicates(client):
+    statement = (
+        "Date,Description,Amount,Category\n"
+        "2025-02-01,Uber ride,-12.50,Transport\n"
+        "2025-02-01,Uber ride,-12.50,Transport\n"
+        "2025-02-02,Salary,\"Rs. 1,000.00\",\n"
+        "2025-02-03,Keells,Rs. -99,Food\n"
+    )
+    response = _import(client, statement, 'statement.csv', signed='1')
+    assert response.status_code == 201
+    assert response.json['imported'] == 3
+    assert response.json['repeat_count'] == 1
+    assert response.json['skipped'] == 1
+    amounts = sorted(e['amount'] for e in client.get('/list').json)
+    assert amounts == [12.5, 12.5, 99.0]
+
+    again = _import(client, statement, 'statement.csv', signed='1')
+    assert again.json['imported'] == 0
+    assert again.json['duplicate_count'] == 3
+
+
+def test_ofx_import(client):
+    statement = (
+        "OFXHEADER:100\n<OFX><BANKTRANLIST>"
+        "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250205<TRNAMT>-45.00<NAME>Pharmacy<MEMO>Medicine</STMTTRN>"
+        "<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20250206<TRNAMT>500.00<NAME>Employer</STMTTRN>"
+        "</BANKTRANLIST></OFX>"
+    )
+    response = _import(client, statement, 'statement.ofx')
+    assert response.status_code == 201
+    assert (response.json['imported'], response.json['skipped']) == (1, 1)
+    [expense] = client.get('/list').json
+    assert (expense['vendor'], expense['amount'], expense['category']) == ('Pharmacy', 45.0, 'Other')
@@ -0,0 +1,64 @@
+import joblib
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+
+import categorizer
+import learning
+import model_registry
+from learning import learn_from_corrections, rollback_model
+from models import db, CategoryCorrection, User
+
+TRAIN = [
+    ('Supermarket groceries', 'Food'), ('Dinner at restaurant', 'Food'),
+    ('Uber taxi ride', 'Transport'), ('Petrol station fuel', 'Transport'),
+    ('Electricity bill payment', 'Bills'), ('Netflix streaming', 'Bills'),
+]
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(learning, 'LEARN_MIN_USERS', 2)
+    vectorizer = TfidfVectorizer()
+    X = vectorizer.fit_transform([text for text, _ in TRAIN])
+    model = MultinomialNB().fit(X, [label for _, label in TRAIN])
+    paths = [str(tmp_path / categorizer.MODEL_PATH), str(tmp_path / categorizer.VECTORIZER_PATH)]
+    joblib.dump(model, paths[0])
+    joblib.dump(vectorizer, paths[1])
+    model_registry.publish(paths)
+    from app import create_app
+    app = create_app({'MIGRATE_ON_STARTUP': False})
+    with app.app_context():
+        db.session.add_all(User(name=f'User {i}', email=f'user{i}@example.com', password_hash='x') for i in range(3))
+        db.session.commit()
+        yield app
+
+
+def _correct(user_id, text, category):
+    db.session.add(CategoryCorrection(user_id=user_id, text=text, from_category='Food', to_category=category))
+    db.session.commit()
+
+
+def _statuses():
+    return [(c.status, c.model_version) for c in CategoryCorrection.query.order_by(CategoryCorrection.id)]
+
+
+def test_corrections_need_several_users_and_return_on_rollback(app):
+    base = model_registry.current_version()
+    _correct(1, 'Spotify premium', 'Bills')
+    _correct(1, 'Spotify premium', 'Bills')
+    assert learn_from_corrections() == (None, 0, 0)
+    assert _statuses() == [('pending', None)] * 2
+
+    _correct(2, '  spotify PREMIUM', 'bills')
+    _correct(3, 'Lottery ticket', 'Gambling')
+    version, learned, skipped = learn_from_corrections()
+    assert (learned, skipped) == (3, 1)
+    assert version != base and model_registry.current_version() == version
+    assert _statuses() == [('learned', version)] * 3 + [('skipped', None)]
+
+    assert rollback_model() == base
+    assert model_registry.current_version() == base
+    assert _statuses() == [('pending', None)] * 3 + [('skipped', None)]
@@ -0,0 +1,38 @@
+import pytest
+
+import model_registry
+from model_registry import RegistryError
+
+
+def _publish(tmp_path, registry, content, activate=True):
+    path = tmp_path / 'vectorizer.pkl'
+    path.write_text(content)
+    return model_registry.publish([str(path)], registry, activate_version=activate)
+
+
+def test_publish_activate_and_rollback(tmp_path):
+    registry = str(tmp_path / 'models')
+    first = _publish(tmp_path, registry, 'v1')
+    second = _publish(tmp_path, registry, 'v2')
+    assert first != second
+    assert model_registry.current_version(registry) == second
+    assert (tmp_path / 'models' / first / 'vectorizer.pkl').read_text() == 'v1'
+
+    assert model_registry.rollback(registry) == first
+    assert model_registry.current_version(registry) == first
+    with pytest.raises(RegistryError):
+        model_registry.rollback(registry)
+
+    model_registry.activate(second, registry)
+    assert model_registry.current_version(registry) == second
+    assert model_registry.list_versions(registry) == sorted([first, second])
+
+
+def test_unknown_version_is_rejected(tmp_path):
+    registry = str(tmp_path / 'models')
+    staged = _publish(tmp_path, registry, 'v1', activate=False)
+    assert model_registry.current_version(registry) is None
+    with pytest.raises(RegistryError):
+        model_registry.activate('missing', registry)
+    model_registry.activate(staged, registry)
+    assert model_registry.current_version(registry) == staged
@@ -0,0 +1,48 @@
+from ocr import _group_into_lines, _pick_date, _pick_receipt_type, _pick_total, _scan_lines
+
+
+def box(y):
+    return [[0, y], [100, y], [100, y + 20], [0, y + 20]]
+
+
+# A typical supermarket receipt as EasyOCR detections: (bbox, text, confidence)
+detections = [
+    (box(0), "KEELLS SUPER", 0.9),
+    (box(30), "Date: 15/01/2025", 0.9),
+    (box(60), "Fresh milk 1L", 0.9),
+    (box(61), "450.00", 0.9),
+    (box(90), "Sub Total", 0.9),
+    (box(91), "1,200.00", 0.9),
+    (box(120), "Grand Total LKR", 0.9),
+    (box(121), "1,250.50", 0.9),
+    (box(150), "VISA 1,250.50", 0.9),
+]
+
+
+def test_scan_extracts_all_fields():
+    scan = _scan_lines(_group_into_lines(detections))
+    total = _pick_total(scan)
+    assert total["amount"] == 1250.50
+    assert total["strategy"] == "keyword_bottommost"
+    assert scan["vendor"] == "KEELLS SUPER"
+    assert _pick_date(scan) == "15/01/2025"
+    assert _pick_receipt_type(scan)["type"] == "grocery"
+
+
+def test_negative_hint_overlapping_positive_hint():
+    # "grand total items" contains the negative hint "total items", so it is not a total line
+    lines = [{"y": 0, "text": "Grand total items 3.00"}, {"y": 20, "text": "Cash 99.00"}]
+    assert _pick_total(_scan_lines(lines))["strategy"] == "global_max"
+
+
+def test_keyword_implies_contained_keywords():
+    # "gas bill" (utilities) also contains "gas" (fuel)
+    scan = _scan_lines([{"y": 0, "text": "Monthly gas bill"}])
+    assert _pick_receipt_type(scan)["all_types"] == ["fuel", "utilities"]
+
+
+if __name__ == '__main__':
+    test_scan_extracts_all_fields()
+    test_negative_hint_overlapping_positive_hint()
+    test_keyword_implies_contained_keywords()
+    print("✅ OCR field extraction tests passed")
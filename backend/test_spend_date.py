@@ -0,0 +1,27 @@
+from datetime import date
+
+from models import parse_spend_date
+
+
+def test_parses_manual_and_ocr_formats():
+    assert parse_spend_date("2025-01-15") == date(2025, 1, 15)
+    assert parse_spend_date("2025/01/15") == date(2025, 1, 15)
+    assert parse_spend_date("15-01-2025") == date(2025, 1, 15)
+    assert parse_spend_date("15/01/2025") == date(2025, 1, 15)
+    assert parse_spend_date("15 Jan 2025") == date(2025, 1, 15)
+    assert parse_spend_date("15  january 2025") == date(2025, 1, 15)
+    assert parse_spend_date("Sept 3, 2024") == date(2024, 9, 3)
+    assert parse_spend_date("2025-01-15T10:30:00") == date(2025, 1, 15)
+
+
+def test_unparseable_dates_are_none():
+    assert parse_spend_date("") is None
+    assert parse_spend_date(None) is None
+    assert parse_spend_date("31-02-2025") is None
+    assert parse_spend_date("yesterday") is None
+
+
+if __name__ == '__main__':
+    test_parses_manual_and_ocr_formats()
+    test_unparseable_dates_are_none()
+    print("✅ Spend date parsing tests passed")
@@ -0,0 +1,114 @@
+# Receipt upload routes - to be imported into app.py
+import json
+import time
+
+from flask import Response, jsonify, request, stream_with_context
+from ocr_cache import cache_stats, get_cached, put_cached, store_upload
+from ocr_jobs import get_job, iter_batch_results, submit_job, worker_reader_stats
+
+# Seconds an SSE stream waits for a job before giving up, and between polls
+OCR_JOB_STREAM_TIMEOUT = 300
+OCR_JOB_POLL_INTERVAL = 0.5
+# Upper bound on receipts accepted by one /upload/batch request
+OCR_BATCH_MAX_FILES = 200
+
+
+def register_upload_routes(app):
+    """Register receipt upload and OCR job routes"""
+
+    @app.route('/upload', methods=['POST'])
+    def upload_receipt():
+        """Save the receipt and queue it for OCR; returns a job id right away (200 with the result if cached)"""
+        if 'file' not in request.files:
+            return jsonify({"error": "No file part"}), 400
+
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({"error": "No selected file"}), 400
+
+        content_hash, filepath = store_upload(file, app.config['UPLOAD_FOLDER'])
+        job = submit_job(filepath, content_hash)
+        response = {
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/upload/{job.id}",
+            "events_url": f"/upload/{job.id}/events",
+        }
+        if job.status == 'done':
+            response["result"] = json.loads(job.result)
+            return jsonify(response)
+        return jsonify(response), 202
+
+    @app.route('/upload/batch', methods=['POST'])
+    def upload_receipts_batch():
+        """OCR many receipts in parallel; streams one NDJSON line per file as it finishes"""
+        files = [f for f in request.files.getlist('files') or request.files.getlist('file') if f.filename]
+        if not files:
+            return jsonify({"error": "No files provided"}), 400
+        if len(files) > OCR_BATCH_MAX_FILES:
+            return jsonify({"error": f"At most {OCR_BATCH_MAX_FILES} files per batch"}), 400
+
+        cached = []
+        pending = []  # (index, content_hash, filepath) still needing OCR
+        for index, file in enumerate(files):
+            content_hash, filepath = store_upload(file, app.config['UPLOAD_FOLDER'])
+            result = get_cached(content_hash)
+            if result is None:
+                pending.append((index, content_hash, filepath))
+            else:
+                cached.append({"index": index, "status": "done", "result": result, "cached": True})
+
+        def results():
+            for item in cached:
+                item["filename"] = files[item["index"]].filename
+                yield json.dumps(item) + "\n"
+            for item in iter_batch_results([filepath for _, _, filepath in pending]):
+                index, content_hash, _ = pending[item["index"]]
+                item["index"] = index
+                item["filename"] = files[index].filename
+                if item["status"] == "done":
+                    put_cached(content_hash, item["result"])
+                yield json.dumps(item) + "\n"
+
+        return Response(stream_with_context(results()), mimetype='application/x-ndjson')
+
+    @app.route('/upload/<job_id>', methods=['GET'])
+    def get_upload_job(job_id):
+        """Poll an OCR job; `result` holds text, lines and fields once done"""
+        job = get_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job.to_dict())
+
+    @app.route('/upload/<job_id>/events', methods=['GET'])
+    def stream_upload_job(job_id):
+        """Server-sent events stream of job status changes, ending with the result"""
+        if not get_job(job_id):
+            return jsonify({"error": "Job not found"}), 404
+
+        def events():
+            deadline = time.monotonic() + OCR_JOB_STREAM_TIMEOUT
+            last_status = None
+            while True:
+                job = get_job(job_id, refresh=True)
+                if job.status != last_status:
+                    last_status = job.status
+                    yield f"event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n"
+                if job.status in ('done', 'failed'):
+                    return
+                if time.monotonic() > deadline:
+                    yield "event: timeout\ndata: {}\n\n"
+                    return
+                yield ": keep-alive\n\n"
+                time.sleep(OCR_JOB_POLL_INTERVAL)
+
+        return Response(
+            stream_with_context(events()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+
+    @app.route('/ocr/stats', methods=['GET'])
+    def ocr_stats():
+        """Reader pool statistics (load time, hits, waits) per OCR worker, plus OCR cache counters"""
+        return jsonify({"workers": worker_reader_stats(), "cache": cache_stats()})
@@ -84,8 +84,9 @@ const AddExpense = () => {
       }
       if (!amount && candidateAmount) setAmount(candidateAmount.replace(/,/g, ''));
     }
+    // Prefer the backend-parsed date, fall back to a simple pattern match
     const dateMatch = text.match(/(\d{4}[-/]\d{2}[-/]\d{2}|\d{2}[-/]\d{2}[-/]\d{4})/);
-    if (!date && dateMatch) setDate(dateMatch[1]);
+    if (!date && (fields?.date || dateMatch)) setDate(fields?.date || dateMatch[1]);
     
     // Smart categorization: Pass receipt_type and vendor for better accuracy
     try {
@@ -22,41 +22,50 @@ import AccountBalanceWalletIcon from '@mui/icons-material/AccountBalanceWallet';
 ChartJS.register(CategoryScale, LinearScale, ArcElement, BarElement, PointElement, LineElement, Tooltip, Legend);
 
 const Dashboard = () => {
-  const [expenses, setExpenses] = useState([]);
+  const [summary, setSummary] = useState({ total: 0, count: 0, average: 0, top_category: null, by_category: [] });
+  const [series, setSeries] = useState({ labels: [], totals: [] });
 
   useEffect(() => {
     const fetch = async () => {
       try {
-        const { data } = await ExpenseAPI.listExpenses();
-        setExpenses(Array.isArray(data) ? data : []);
+        // Totals and the daily series are aggregated server-side
+        const [summaryRes, seriesRes] = await Promise.all([
+          ExpenseAPI.getSummary({ vendors: 0 }),
+          ExpenseAPI.getTimeseries({ period: 'day' }),
+        ]);
+        setSummary(summaryRes.data);
+        setSeries(seriesRes.data);
       } catch (e) {
         // fallback demo
-        setExpenses([
-          { date: '2025-10-01', category: 'Food', amount: 120, description: 'Lunch' },
-          { date: '2025-10-03', category: 'Transport', amount: 80, description: 'Taxi' },
-          { date: '2025-10-06', category: 'Bills', amount: 200, description: 'Electricity' },
-        ]);
+        setSummary({
+          total: 400,
+          count: 3,
+          average: 133.33,
+          top_category: 'Bills',
+          by_category: [
+            { category: 'Bills', total: 200, count: 1 },
+            { category: 'Food', total: 120, count: 1 },
+            { category: 'Transport', total: 80, count: 1 },
+          ],
+        });
+        setSeries({ labels: ['2025-10-01', '2025-10-03', '2025-10-06'], totals: [120, 80, 200] });
       }
     };
     fetch();
   }, []);
 
   const totals = useMemo(() => {
-    const sum = expenses.reduce((acc, e) => acc + Number(e.amount || 0), 0);
-    const byCat = expenses.reduce((acc, e) => {
-      const cat = e.category || 'Other';
-      acc[cat] = (acc[cat] || 0) + Number(e.amount || 0);
-      return acc;
-    }, {});
-    const topCat = Object.entries(byCat).sort((a, b) => b[1] - a[1])[0]?.[0] || '—';
-    
-    // Calculate insights
-    const avgExpense = expenses.length > 0 ? (sum / expenses.length).toFixed(2) : 0;
-    const foodSpend = byCat['Food'] || 0;
-    const transportSpend = byCat['Transport'] || 0;
-    
-    return { sum, byCat, topCat, avgExpense, foodSpend, transportSpend };
-  }, [expenses]);
+    const byCat = Object.fromEntries(summary.by_category.map((c) => [c.category, c.total]));
+    return {
+      sum: Number(summary.total || 0),
+      byCat,
+      topCat: summary.top_category || '—',
+      avgExpense: Number(summary.average || 0).toFixed(2),
+      foodSpend: byCat['Food'] || 0,
+      transportSpend: byCat['Transport'] || 0,
+      count: summary.count || 0,
+    };
+  }, [summary]);
 
   const barData = {
     labels: Object.keys(totals.byCat),
@@ -68,9 +77,9 @@ const Dashboard = () => {
   const pieData = barData;
 
   const lineData = {
-    labels: expenses.map((e) => e.date),
+    labels: series.labels,
     datasets: [
-      { label: 'Daily Spend', data: expenses.map((e) => Number(e.amount || 0)), borderColor: '#007BFF' },
+      { label: 'Daily Spend', data: series.totals, borderColor: '#007BFF' },
     ],
   };
 
@@ -311,12 +320,12 @@ const Dashboard = () => {
                   � Transport: Rs. {totals.transportSpend.toFixed(2)}. Try carpooling!
                 </Typography>
               )}
-              {expenses.length > 5 && (
+              {totals.count > 5 && (
                 <Typography variant="body2" paragraph sx={{ mb: 1 }}>
-                  📊 {expenses.length} expenses logged. Great tracking!
+                  📊 {totals.count} expenses logged. Great tracking!
                 </Typography>
               )}
-              {expenses.length === 0 && (
+              {totals.count === 0 && (
                 <Typography variant="body2">
                   📝 No expenses yet. Add your first expense!
                 </Typography>
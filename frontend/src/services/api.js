@@ -17,6 +17,12 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// How long uploadReceipt waits for a background OCR job before giving up
+const OCR_JOB_TIMEOUT_MS = 5 * 60 * 1000;
+const OCR_JOB_POLL_MS = 1000;
+
 // Simple helpers
 export const AuthAPI = {
   login: (email, password) => api.post('/login', { email, password }),
@@ -26,13 +32,65 @@ export const AuthAPI = {
 };
 
 export const ExpenseAPI = {
-  uploadReceipt: (file) => {
+  uploadReceipt: async (file) => {
     const formData = new FormData();
     formData.append('file', file);
-    return api.post('/upload', formData, { headers: { 'Content-Type': 'multipart/form-data' } });
+    const upload = await api.post('/upload', formData, { headers: { 'Content-Type': 'multipart/form-data' } });
+    const job = upload.data;
+    // Previously seen receipts come back with their cached result straight away
+    if (job.status === 'done') return { ...upload, data: job.result };
+    // Otherwise OCR runs as a background job: poll until it finishes and resolve with its result
+    const deadline = Date.now() + OCR_JOB_TIMEOUT_MS;
+    while (Date.now() < deadline) {
+      const response = await api.get(`/upload/${job.job_id}`);
+      if (response.data.status === 'done') return { ...response, data: response.data.result };
+      if (response.data.status === 'failed') throw new Error(response.data.error || 'OCR failed');
+      await sleep(OCR_JOB_POLL_MS);
+    }
+    throw new Error('OCR is taking too long; please try again later');
+  },
+  // Upload many receipts at once; onResult receives each file's result as soon as it finishes
+  uploadReceiptsBatch: async (files, onResult) => {
+    const formData = new FormData();
+    Array.from(files).forEach((file) => formData.append('files', file));
+    const token = localStorage.getItem('token');
+    const response = await fetch(`${API_BASE_URL}/upload/batch`, {
+      method: 'POST',
+      body: formData,
+      headers: token ? { Authorization: `Bearer ${token}` } : {},
+    });
+    if (!response.ok) throw new Error(`Batch upload failed (${response.status})`);
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const results = [];
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      lines.filter(Boolean).forEach((line) => {
+        const item = JSON.parse(line);
+        results.push(item);
+        if (onResult) onResult(item);
+      });
+    }
+    return results;
   },
   addExpense: (payload) => api.post('/add', payload),
-  listExpenses: () => api.get('/list'),
+  // Import a CSV or OFX/QFX bank statement; resolves with imported/duplicate/error counts
+  importStatement: (file, options = {}) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    Object.entries(options).forEach(([key, value]) => formData.append(key, value));
+    return api.post('/import', formData, { headers: { 'Content-Type': 'multipart/form-data' } });
+  },
+  listExpenses: (params) => api.get('/list', { params }),
+  getSummary: (params) => api.get('/analytics/summary', { params }),
+  // Download the history as csv, ndjson or parquet (params: format plus /list filters)
+  exportExpenses: (params) => api.get('/export', { params, responseType: 'blob' }),
+  getTimeseries: (params) => api.get('/analytics/timeseries', { params }),
   deleteExpense: (id) => api.delete(`/delete/${id}`),
   updateExpense: (id, payload) => api.put(`/update/${id}`, payload),
   categorize: (payload) => {
@@ -42,6 +100,8 @@ export const ExpenseAPI = {
     }
     return api.post('/categorize', payload);
   },
+  // items: [{ text, receipt_type, vendor }] -> list of results in the same order
+  categorizeBatch: (items, topK = 3) => api.post('/categorize/batch', { items, top_k: topK }),
 };
 
 export const BudgetAPI = {